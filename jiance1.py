@@ -5,7 +5,7 @@
 
 import cv2
 import customtkinter as ctk
-from tkinter import filedialog, messagebox, Listbox, Scrollbar, simpledialog, ttk, StringVar, IntVar
+from tkinter import filedialog, messagebox, Listbox, Scrollbar, simpledialog, ttk, StringVar, IntVar, Entry, Text
 import numpy as np
 from ultralytics import YOLO
 import os
@@ -17,13 +17,17 @@ from pathlib import Path
 import hashlib
 import logging
 from datetime import datetime
-from queue import Queue
+from queue import Queue, Empty, Full
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import difflib
 import glob
-from PIL import Image, ImageDraw, ImageFont
+import importlib.util
+import zlib
+from PIL import Image, ImageDraw, ImageFont, ImageTk
 import pygame  # 用于播放提示音
 import pyttsx3  # 用于语音合成
 import random
-import winsound  # Windows提示音
 import subprocess
 import tempfile
 from pydub import AudioSegment
@@ -34,6 +38,92 @@ import io
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+
+def _parse_number(text, kind=float):
+    """按kind（float或int）解析输入框文本，格式无效时返回None"""
+    try:
+        return kind(text)
+    except ValueError:
+        return None
+
+
+def _atomic_write_json(path, obj):
+    """先整体序列化再一次写入临时文件，最后原子替换目标文件"""
+    data = json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+# 检测框绘制参数
+_BOX_COLOR = (0, 255, 0)
+_BOX_FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+
+def _draw_detections(frame, xyxy, confs):
+    """在帧上绘制检测框与置信度；xyxy/confs为推理结果的NumPy数组，一次性转为Python列表后遍历"""
+    rectangle, put_text = cv2.rectangle, cv2.putText
+    for (x1, y1, x2, y2), conf in zip(xyxy.tolist(), confs.tolist()):
+        rectangle(frame, (x1, y1), (x2, y2), _BOX_COLOR, 2)
+        put_text(frame, f"{conf:.2f}", (x1, y1 - 10), _BOX_FONT, 0.5, _BOX_COLOR, 2)
+
+
+def _percentiles(samples):
+    """返回样本的 (p50, p95)，无样本时返回 (0, 0)"""
+    if not samples:
+        return 0.0, 0.0
+    ordered = sorted(samples.copy())  # deque.copy()在GIL下一次完成，不受其他线程追加影响
+    last = len(ordered) - 1
+    return ordered[last // 2], ordered[last * 95 // 100]
+
+
+# 导出加速模型所需的可选依赖；缺失时ultralytics会在运行时自动pip安装，因此导出前先检查
+_ONNX_EXPORT_MODULES = ("onnx", "onnxslim", "onnxruntime")
+_TRT_EXPORT_MODULES = _ONNX_EXPORT_MODULES + ("tensorrt",)
+
+
+def _accel_export_format():
+    """返回本机可直接导出的加速格式：有CUDA时为engine，否则为onnx；依赖未安装时返回None"""
+    import torch
+    if torch.cuda.is_available():
+        fmt, modules = "engine", _TRT_EXPORT_MODULES
+    else:
+        fmt, modules = "onnx", _ONNX_EXPORT_MODULES
+    if all(importlib.util.find_spec(m) is not None for m in modules):
+        return fmt
+    return None
+
+
+def _read_json(path):
+    """读取JSON配置文件，文件不存在时返回None（不访问Tk，可在线程池中执行）"""
+    if not path.exists():
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+# 可选：Numba JIT 加速水印混合，未安装时回退到 NumPy 实现
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _blend_roi_jit(roi, premul, inv_alpha):
+        """逐像素融合乘加：roi = premul + roi * inv_alpha，按行并行，无临时数组"""
+        for y in prange(roi.shape[0]):
+            for x in range(roi.shape[1]):
+                a = inv_alpha[y, x, 0]
+                for c in range(3):
+                    roi[y, x, c] = np.uint8(premul[y, x, c] + roi[y, x, c] * a)
+
+    # 预热：启动时编译一次，避免首帧卡顿
+    _blend_roi_jit(np.zeros((1, 1, 3), np.uint8),
+                   np.zeros((1, 1, 3), np.float32),
+                   np.ones((1, 1, 1), np.float32))
+
 # 设置外观
 ctk.set_appearance_mode("light")
 ctk.set_default_color_theme("blue")
@@ -41,16 +131,15 @@ ctk.set_default_color_theme("blue")
 
 # ========== 音频管理器（修复版） ==========
 class AudioManager:
-    """音频管理器，使用事件回调确保连续播报"""
+    """音频管理器，语音播报由专用线程从队列中依次取出执行，调用方不会被阻塞"""
 
     def __init__(self):
         self.engine = None
         self.initialized = False
-        self.message_queue = []  # 消息队列
-        self.is_speaking = False  # 是否正在播报
-        self._init_audio()
-        self.speech_start_time = 0  # 记录语音开始时间
+        self.message_queue = Queue()  # 消息队列（由播报线程消费）
+        self._beep = None  # 预生成的提示音
         self.last_log_time = 0  # 记录上次日志时间
+        self._init_audio()
 
     def _init_audio(self):
         """初始化音频系统"""
@@ -58,74 +147,82 @@ class AudioManager:
             # 初始化pygame用于播放提示音
             pygame.mixer.init(frequency=22050, size=-16, channels=2, buffer=512)
 
-            # 初始化语音合成引擎
-            self.engine = pyttsx3.init()
-
-            # 设置语音属性（中文支持）
-            voices = self.engine.getProperty('voices')
-
-            # 尝试设置中文语音
-            for voice in voices:
-                if 'chinese' in voice.name.lower() or 'zh' in voice.name.lower() or '中文' in voice.name:
-                    self.engine.setProperty('voice', voice.id)
-                    break
-                elif 'Microsoft Huihui' in voice.name or 'Microsoft Zira' in voice.name:
-                    # Windows系统中文语音
-                    self.engine.setProperty('voice', voice.id)
+            # 预生成提示音：1000Hz正弦波，持续300ms（16位立体声，与mixer格式一致）
+            t = np.linspace(0, 0.3, int(22050 * 0.3), endpoint=False)
+            wave = (0.5 * np.sin(2 * np.pi * 1000 * t) * 32767).astype(np.int16)
+            stereo = np.repeat(wave[:, None], 2, axis=1)
+            self._beep = pygame.sndarray.make_sound(np.ascontiguousarray(stereo))
 
-            # 设置语速和音量
-            self.engine.setProperty('rate', 160)  # 稍慢一点的语速
-            self.engine.setProperty('volume', 0.9)  # 音量
+            # 先置位再启动播报线程：引擎初始化失败时由播报线程清除，不会被此处覆盖
+            self.initialized = True
 
-            # 连接结束事件
-            self.engine.connect('finished-utterance', self._on_speech_end)
+            # 语音引擎需在使用它的线程中创建，交由播报线程初始化
+            threading.Thread(target=self._speech_worker, daemon=True).start()
 
-            self.initialized = True
             logger.info("音频系统初始化成功")
 
         except Exception as e:
             logger.error(f"音频系统初始化失败: {e}")
             self.initialized = False
 
-    def _on_speech_end(self, name, completed):
-        """语音播报结束回调"""
-        self.is_speaking = False
+    def _init_engine(self):
+        """初始化语音合成引擎（在播报线程中调用）"""
+        self.engine = pyttsx3.init()
 
-        # 如果队列中有消息，播放下一条
-        if self.message_queue:
-            time.sleep(0.5)  # 给一点间隔时间
-            self._process_next_message()
+        # 设置语音属性（中文支持）
+        voices = self.engine.getProperty('voices')
 
-    def _process_next_message(self):
-        """处理下一条消息"""
-        if self.message_queue and not self.is_speaking:
-            next_message = self.message_queue.pop(0)
-            self._speak_direct(next_message)
+        # 尝试设置中文语音
+        for voice in voices:
+            if 'chinese' in voice.name.lower() or 'zh' in voice.name.lower() or '中文' in voice.name:
+                self.engine.setProperty('voice', voice.id)
+                break
+            elif 'Microsoft Huihui' in voice.name or 'Microsoft Zira' in voice.name:
+                # Windows系统中文语音
+                self.engine.setProperty('voice', voice.id)
 
-    def _speak_direct(self, text):
-        """直接播报文本（内部方法）"""
-        if not self.initialized or not self.engine:
-            return
+        # 设置语速和音量
+        self.engine.setProperty('rate', 160)  # 稍慢一点的语速
+        self.engine.setProperty('volume', 0.9)  # 音量
 
+    def _speech_worker(self):
+        """播报线程：依次取出消息并播报，None表示退出"""
         try:
-            self.is_speaking = True
-            self.speech_start_time = time.time()
-            self.engine.say(text, text)
-            self.engine.runAndWait()
-            current_time = time.time()
-            # 控制日志输出频率（每5秒输出一次）
-            if current_time - self.last_log_time > 5:
-                logger.info(f"语音播报: {text}")
-                self.last_log_time = current_time
+            self._init_engine()
         except Exception as e:
-            logger.error(f"语音播报失败: {e}")
-            self.is_speaking = False
+            logger.error(f"语音引擎初始化失败: {e}")
+            self.engine = None
+            self.initialized = False
+            return
+
+        while True:
+            text = self.message_queue.get()
+            if text is None:
+                break
+
+            try:
+                self.engine.say(text, text)
+                self.engine.runAndWait()
+                current_time = time.time()
+                # 控制日志输出频率（每5秒输出一次）
+                if current_time - self.last_log_time > 5:
+                    logger.info(f"语音播报: {text}")
+                    self.last_log_time = current_time
+            except Exception as e:
+                logger.error(f"语音播报失败: {e}")
+
+            # 连续播报时给一点间隔时间
+            if not self.message_queue.empty():
+                time.sleep(0.5)
 
     def play_beep(self):
         """播放提示音"""
+        if self._beep is None:
+            return
+
         try:
-            # 使用winsound播放标准提示音
-            winsound.Beep(1000, 300)  # 频率1000Hz，持续300ms
+            # 由mixer线程异步播放，不阻塞调用线程
+            self._beep.play()
             current_time = time.time()
             # 控制日志输出频率
             if current_time - self.last_log_time > 5:
@@ -135,8 +232,8 @@ class AudioManager:
             logger.error(f"播放提示音失败: {e}")
 
     def speak(self, text):
-        """语音播报文本 - 使用队列机制，允许相同内容连续播报"""
-        if not self.initialized or not self.engine:
+        """语音播报文本 - 加入队列后立即返回，允许相同内容连续播报"""
+        if not self.initialized:
             logger.warning("音频系统未初始化")
             return
 
@@ -144,30 +241,25 @@ class AudioManager:
             return
 
         # 将消息加入队列
-        self.message_queue.append(text)
+        self.message_queue.put(text)
 
         # 控制日志输出频率
         current_time = time.time()
         if current_time - self.last_log_time > 5:
-            logger.info(f"消息加入队列: {text} (队列长度: {len(self.message_queue)})")
+            logger.info(f"消息加入队列: {text} (队列长度: {self.message_queue.qsize()})")
             self.last_log_time = current_time
 
-        # 如果当前没有在播报，立即开始
-        if not self.is_speaking:
-            self._process_next_message()
-        else:
-            # 控制日志输出频率
-            if current_time - self.last_log_time > 5:
-                logger.info(f"当前正在播报，消息排队等待")
-
     def stop(self):
         """停止音频系统"""
         try:
-            if self.engine:
-                self.engine.stop()
+            # 丢弃未播报的消息并通知播报线程退出
+            while True:
+                try:
+                    self.message_queue.get_nowait()
+                except Empty:
+                    break
+            self.message_queue.put(None)
             pygame.mixer.quit()
-            self.message_queue.clear()
-            self.is_speaking = False
             logger.info("音频系统已停止")
         except Exception as e:
             logger.error(f"停止音频系统失败: {e}")
@@ -177,22 +269,47 @@ class AudioManager:
 class RPModelHandler:
     """RP模型加密解密处理器 - 与训练端保持一致"""
 
-    HEADER = b"PILL_MODEL_RP_2026"  # 保持与训练端相同的文件头
+    HEADER = b"PILL_MODEL_RP_2027"  # 保持与训练端相同的文件头（SHA-256摘要）
+    LEGACY_HEADER = b"PILL_MODEL_RP_2026"  # 旧版文件头（MD5摘要），仅用于解密
+    HASHES = {HEADER: hashlib.sha256, LEGACY_HEADER: hashlib.md5}
     KEY = 0x5A
+    CHUNK_SIZE = 1 << 20  # 分块大小 1 MiB
+
+    @staticmethod
+    def _xor_stream(fin, fout, hasher, hash_output):
+        """分块异或：复用固定缓冲区，边读边计算摘要边写出
+
+        hash_output为True时对异或结果计算摘要（解密），否则对输入计算摘要（加密）
+        """
+        buf = bytearray(RPModelHandler.CHUNK_SIZE)
+        src = np.frombuffer(buf, dtype=np.uint8)
+        dst = np.empty_like(src)
+        key = np.uint8(RPModelHandler.KEY)
+
+        while True:
+            n = fin.readinto(buf)
+            if not n:
+                break
+            np.bitwise_xor(src[:n], key, out=dst[:n])
+            hasher.update(dst[:n] if hash_output else src[:n])
+            fout.write(memoryview(dst[:n]))
 
     @staticmethod
     def encrypt_model(pt_path, rp_path):
         """加密模型文件"""
         try:
-            with open(pt_path, 'rb') as f:
-                model_data = f.read()
-                md5 = hashlib.md5(model_data).digest()
+            hasher = hashlib.sha256()
+            with open(pt_path, 'rb') as fin, open(rp_path, 'wb') as fout:
+                fout.write(RPModelHandler.HEADER)
+                # 先写入摘要占位，数据写完后回填
+                digest_pos = fout.tell()
+                fout.write(bytes(hasher.digest_size))
 
-            # 简单异或加密
-            encrypted_data = bytes([b ^ RPModelHandler.KEY for b in model_data])
+                # 简单异或加密
+                RPModelHandler._xor_stream(fin, fout, hasher, hash_output=False)
 
-            with open(rp_path, 'wb') as f:
-                f.write(RPModelHandler.HEADER + md5 + encrypted_data)
+                fout.seek(digest_pos)
+                fout.write(hasher.digest())
 
             logger.info(f"模型加密成功: {pt_path} -> {rp_path}")
             return True
@@ -204,37 +321,47 @@ class RPModelHandler:
     @staticmethod
     def decrypt_model(rp_path, pt_path):
         """解密模型文件"""
+        part_path = f"{pt_path}.part"
         try:
-            with open(rp_path, 'rb') as f:
-                header = f.read(16)
-                if header != RPModelHandler.HEADER:
+            with open(rp_path, 'rb') as fin:
+                header = fin.read(len(RPModelHandler.HEADER))
+                hash_factory = RPModelHandler.HASHES.get(header)
+                if hash_factory is None:
                     logger.error("无效的模型文件头")
                     return False
 
-                md5 = f.read(16)
-                encrypted_data = f.read()
+                hasher = hash_factory()
+                expected = fin.read(hasher.digest_size)
 
-            # 解密
-            model_data = bytes([b ^ RPModelHandler.KEY for b in encrypted_data])
+                # 解密到临时文件，校验通过后再替换目标文件
+                with open(part_path, 'wb') as fout:
+                    RPModelHandler._xor_stream(fin, fout, hasher, hash_output=True)
 
             # 校验完整性
-            if hashlib.md5(model_data).digest() != md5:
+            if hasher.digest() != expected:
                 logger.error("模型文件校验失败")
+                os.remove(part_path)
                 return False
 
-            with open(pt_path, 'wb') as f:
-                f.write(model_data)
+            os.replace(part_path, pt_path)
 
             logger.info(f"模型解密成功: {rp_path} -> {pt_path}")
             return True
 
         except Exception as e:
             logger.error(f"模型解密失败: {e}")
+            if os.path.exists(part_path):
+                os.remove(part_path)
             return False
 
 
 class CameraThread(threading.Thread):
-    """摄像头线程，使用队列安全传递帧"""
+    """摄像头线程，通过单槽位安全传递最新帧"""
+
+    # 预分配帧缓冲区数量：采集中1个 + 槽位中1个 + 消费者持有1个
+    BUFFER_COUNT = 3
+    # 暂停超过该秒数即释放设备并结束线程，避免界面显示已关闭时仍独占摄像头
+    IDLE_RELEASE_SECONDS = 5
 
     def __init__(self, camera_index, width, height):
         super().__init__(daemon=True)
@@ -242,10 +369,31 @@ class CameraThread(threading.Thread):
         self.width = width
         self.height = height
         self.running = True
-        self.frame_queue = Queue(maxsize=1)
+        self.frame_slot = deque(maxlen=1)  # 只保留最新帧，append时自动丢弃旧帧
         self.camera = None
         self.last_log_time = 0  # 控制日志输出频率
 
+        # 帧缓冲池，避免每帧分配新数组
+        self._buffers = None
+        self._buffer_lock = threading.Lock()
+        self._queued_idx = None  # 槽位中的缓冲区索引
+        self._held_idx = None  # 消费者持有的缓冲区索引
+
+        # 预览尺寸 (宽, 高)，设置后在采集线程中为每帧同步生成缩略图，与帧缓冲一一对应
+        self.preview_size = None
+        self._previews = [None] * self.BUFFER_COUNT
+
+        # 消费者取走一帧后才解码下一帧，解码开销随消费速率而非相机帧率变化
+        self._frame_requested = threading.Event()
+        self._frame_requested.set()
+        self._frame_ready = threading.Event()  # 槽位中有新帧，供消费者阻塞等待
+
+        # 短暂暂停时设备保持打开，很快重新打开摄像头时无需再次初始化驱动
+        self._active = threading.Event()
+        self._active.set()
+        self._paused_at = 0.0
+        self._state_lock = threading.Lock()  # 保证恢复与空闲释放不会同时发生
+
     def run(self):
         """线程主函数"""
         try:
@@ -263,35 +411,126 @@ class CameraThread(threading.Thread):
                 logger.error(f"无法打开摄像头 {self.camera_index}")
                 return
 
+            # 先设置MJPEG格式再设分辨率（DSHOW下顺序相反会被忽略），避免USB带宽限制帧率
+            self.camera.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
             self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
             self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
             self.camera.set(cv2.CAP_PROP_FPS, 30)
+            # 驱动只缓存1帧，保证检测与稳定计时使用的是最新画面（仅部分后端支持，如DSHOW）
+            buffer_ok = self.camera.set(cv2.CAP_PROP_BUFFERSIZE, 1)
 
-            logger.info(f"摄像头 {self.camera_index} 启动成功")
+            logger.info(f"摄像头 {self.camera_index} 启动成功 "
+                        f"(后端: {self.camera.getBackendName()}, 缓冲区设置{'生效' if buffer_ok else '不受支持'})")
 
             while self.running:
-                ret, frame = self.camera.read()
-                if ret:
-                    if self.frame_queue.full():
-                        try:
-                            self.frame_queue.get_nowait()
-                        except:
-                            pass
-                    self.frame_queue.put(frame.copy())
+                if not self._active.is_set():
+                    # 暂停期间不取帧；恢复后先丢弃驱动中缓存的旧帧
+                    if self._active.wait(0.1):
+                        self.camera.grab()
+                    elif time.monotonic() - self._paused_at > self.IDLE_RELEASE_SECONDS:
+                        with self._state_lock:
+                            if not self._active.is_set():
+                                logger.info(f"摄像头 {self.camera_index} 空闲，释放设备")
+                                self.running = False
+                    continue
+
+                # grab只从驱动取出最新帧，代价很低，并按摄像头帧率阻塞
+                if not self.camera.grab():
+                    time.sleep(0.01)  # 读取失败时避免空转
+                    continue
 
-                cv2.waitKey(1)
+                # 消费者尚未取走上一帧时跳过解码
+                if self._frame_requested.is_set():
+                    if self._buffers is None:
+                        # 首帧确定实际分辨率后再分配缓冲池
+                        ret, frame = self.camera.retrieve()
+                        if ret:
+                            self._buffers = [np.empty_like(frame) for _ in range(self.BUFFER_COUNT)]
+                    else:
+                        idx = self._acquire_buffer()
+                        ret, frame = self.camera.retrieve(self._buffers[idx])
+                        if ret:
+                            # 分辨率变化时OpenCV会返回新数组，替换对应缓冲区
+                            self._buffers[idx] = frame
+                            preview_size = self.preview_size
+                            if preview_size:
+                                # 缩小超过2倍时INTER_AREA质量更好
+                                self._previews[idx] = cv2.resize(frame, preview_size, dst=self._previews[idx],
+                                                                 interpolation=cv2.INTER_AREA)
+                            self._publish(idx)
 
         except Exception as e:
             logger.error(f"摄像头线程错误: {e}")
         finally:
             self.stop()
 
-    def get_frame(self):
-        """获取最新帧"""
-        try:
-            return self.frame_queue.get_nowait()
-        except:
-            return None
+    def _acquire_buffer(self):
+        """选取一个既不在槽位中、也未被消费者持有的缓冲区"""
+        with self._buffer_lock:
+            for idx in range(self.BUFFER_COUNT):
+                if idx != self._queued_idx and idx != self._held_idx:
+                    return idx
+
+    def _publish(self, idx):
+        """发布新帧，槽位中未被取走的旧帧被直接覆盖"""
+        with self._buffer_lock:
+            self.frame_slot.append(idx)
+            self._queued_idx = idx
+            self._frame_requested.clear()  # 与get_frame中的set同在锁内，避免丢失取帧请求
+            self._frame_ready.set()
+
+    def get_frame(self, timeout=None):
+        """获取最新帧，timeout不为None时最多等待timeout秒
+
+        返回的数组在下一次调用get_frame之前不会被采集线程覆盖，
+        需要跨帧保留时由调用方自行复制
+        """
+        if timeout is not None:
+            self._frame_ready.wait(timeout)
+        with self._buffer_lock:
+            try:
+                idx = self.frame_slot.popleft()
+            except IndexError:
+                return None
+            self._frame_ready.clear()
+            self._queued_idx = None
+            self._held_idx = idx
+            self._frame_requested.set()
+            return self._buffers[idx]
+
+    def get_preview(self):
+        """获取与最近一次get_frame对应的预览缩略图，未设置预览尺寸时返回None"""
+        with self._buffer_lock:
+            if self._held_idx is None:
+                return None
+            preview = self._previews[self._held_idx]
+            if preview is None or preview.shape[1::-1] != self.preview_size:
+                return None
+            return preview
+
+    @property
+    def paused(self):
+        """是否处于暂停状态"""
+        return not self._active.is_set()
+
+    def pause(self):
+        """暂停采集，设备保持打开，空闲超过IDLE_RELEASE_SECONDS后自动释放"""
+        self._paused_at = time.monotonic()
+        self._active.clear()
+
+    def resume(self):
+        """恢复采集，丢弃暂停前残留在槽位中的旧帧；设备已因空闲释放时返回False"""
+        with self._state_lock:
+            if not self.running:
+                return False
+            with self._buffer_lock:
+                self.frame_slot.clear()
+                self._queued_idx = None
+                self._held_idx = None
+                self._frame_ready.clear()
+                self._frame_requested.set()
+            self._active.set()
+        return True
 
     def stop(self):
         """停止线程"""
@@ -304,6 +543,153 @@ class CameraThread(threading.Thread):
             self.last_log_time = current_time
 
 
+class InferenceThread(threading.Thread):
+    """推理线程：从摄像头线程取帧并执行检测，结果交由界面线程绘制
+
+    采集、推理、绘制各占一个线程形成流水线：推理当前帧时下一帧已在采集，
+    上一帧正在界面上绘制。阶段之间只保留最新结果，慢的阶段自动丢弃旧帧，不会积压延迟
+    """
+
+    def __init__(self, camera_thread, detect_fn, notify_fn=None):
+        super().__init__(daemon=True)
+        self.camera_thread = camera_thread
+        self.detect_fn = detect_fn  # detect_fn(frame) -> (检测框, 置信度)，未开启检测时返回None
+        self.notify_fn = notify_fn  # 有新结果时调用，通知界面线程取结果
+        self.running = True
+        self.result_slot = deque(maxlen=1)  # (帧, 预览缩略图, 检测结果)
+        self.last_log_time = 0  # 控制日志输出频率
+
+        # 运行统计：最近的推理耗时(ms)与界面来不及取走而被覆盖的结果数
+        self.infer_ms = deque(maxlen=128)
+        self.dropped = 0
+
+    def run(self):
+        """线程主函数"""
+        torch = stream = None
+        try:
+            import torch
+            if torch.cuda.is_available():
+                stream = torch.cuda.Stream()  # 独立CUDA流，拷贝与计算不阻塞默认流
+        except ImportError:
+            pass
+
+        while self.running:
+            frame = self.camera_thread.get_frame(timeout=0.1)
+            if frame is None:
+                if not self.camera_thread.is_alive():
+                    break
+                continue
+
+            # 采集线程的缓冲区在下次取帧后会被复用，复制一份交给下游独占
+            frame = frame.copy()
+            preview = self.camera_thread.get_preview()
+            if preview is not None:
+                preview = preview.copy()
+
+            start = time.perf_counter()
+            try:
+                if stream is not None:
+                    with torch.cuda.stream(stream):
+                        detections = self.detect_fn(frame)
+                else:
+                    detections = self.detect_fn(frame)
+                self.infer_ms.append((time.perf_counter() - start) * 1000)
+            except Exception as e:
+                detections = None
+                current_time = time.time()
+                if current_time - self.last_log_time > 10:
+                    logger.error(f"推理错误: {e}")
+                    self.last_log_time = current_time
+
+            if self.result_slot:
+                self.dropped += 1
+            self.result_slot.append((frame, preview, detections))
+            if self.notify_fn is not None:
+                try:
+                    self.notify_fn()
+                except Exception:
+                    # 窗口已销毁等情况下通知失败，直接退出
+                    break
+
+    def get_result(self):
+        """获取最新的推理结果 (帧, 预览缩略图, 检测结果)，没有新结果时返回None"""
+        try:
+            return self.result_slot.popleft()
+        except IndexError:
+            return None
+
+    def stop(self):
+        """停止线程"""
+        self.running = False
+
+
+class VideoRecorder(threading.Thread):
+    """录像线程：界面线程只把帧放入有界队列，编码写盘在后台完成
+
+    接口与cv2.VideoWriter相同（write/release），队列满时丢弃新帧并计数，不阻塞界面
+    """
+
+    QUEUE_SIZE = 8
+
+    def __init__(self, path, fourcc, fps, frame_size):
+        super().__init__(daemon=True)
+        self.writer = self._open_writer(path, fourcc, fps, frame_size)
+        if not self.writer.isOpened():
+            raise RuntimeError(f"无法创建视频文件: {path}")
+        self.frame_queue = Queue(maxsize=self.QUEUE_SIZE)
+        self.dropped = 0
+        self.start()
+
+    @staticmethod
+    def _open_writer(path, fourcc, fps, frame_size):
+        """优先使用硬件加速的H.264编码（NVENC/VA-API/QSV等），不可用时回退到指定的软件编码"""
+        try:
+            params = [cv2.VIDEOWRITER_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+            writer = cv2.VideoWriter(path, cv2.CAP_FFMPEG, cv2.VideoWriter_fourcc(*'avc1'),
+                                     fps, frame_size, params)
+            if writer.isOpened():
+                # ANY允许FFmpeg回退到软件H.264，按实际选中的加速类型记录
+                accel = int(writer.get(cv2.VIDEOWRITER_PROP_HW_ACCELERATION))
+                if accel > cv2.VIDEO_ACCELERATION_NONE:
+                    accel_names = {cv2.VIDEO_ACCELERATION_D3D11: "D3D11",
+                                   cv2.VIDEO_ACCELERATION_VAAPI: "VA-API",
+                                   cv2.VIDEO_ACCELERATION_MFX: "Intel MFX"}
+                    logger.info(f"录像使用H.264硬件加速编码: {accel_names.get(accel, accel)}")
+                else:
+                    logger.info("录像使用H.264软件编码（无可用的硬件加速）")
+                return writer
+            writer.release()
+        except (AttributeError, cv2.error):
+            pass  # OpenCV版本过旧或未编译FFmpeg硬件加速支持
+        return cv2.VideoWriter(path, fourcc, fps, frame_size)
+
+    def run(self):
+        """线程主函数"""
+        while True:
+            frame = self.frame_queue.get()
+            if frame is None:
+                break
+            try:
+                self.writer.write(frame)
+            except Exception as e:
+                logger.error(f"写入录像帧失败: {e}")
+
+    def write(self, frame):
+        """提交一帧（调用方之后不得再修改该帧）"""
+        try:
+            self.frame_queue.put_nowait(frame)
+        except Full:
+            self.dropped += 1
+
+    def release(self):
+        """写完队列中剩余的帧后关闭文件"""
+        self.frame_queue.put(None)
+        self.join()
+        self.writer.release()
+        if self.dropped:
+            logger.info(f"录像期间因编码跟不上丢弃了 {self.dropped} 帧")
+
+
 class DraggablePreview:
     """可拖动的摄像头预览窗口"""
 
@@ -362,6 +748,12 @@ class DraggablePreview:
         )
         self.canvas.pack(fill="both", expand=True, padx=0, pady=0)
 
+        # 常驻的预览图像与画布项，每帧只原地更新像素，避免反复创建位图
+        self.preview_size = (width, height - 30)
+        self._resized = np.empty((height - 30, width, 3), dtype=np.uint8)
+        self._tk_img = ImageTk.PhotoImage(Image.new("RGB", self.preview_size))
+        self._item_id = self.canvas.create_image(0, 0, image=self._tk_img, anchor="nw")
+
         # 绑定拖动事件
         title_frame.bind("<ButtonPress-1>", self.start_drag)
         title_frame.bind("<B1-Motion>", self.on_drag)
@@ -391,18 +783,13 @@ class DraggablePreview:
         """更新预览图像"""
         if frame is not None:
             try:
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                frame_resized = cv2.resize(frame_rgb, (self.width, self.height - 30))
-
-                pil_img = Image.fromarray(frame_resized)
-                preview_photo = ctk.CTkImage(light_image=pil_img, size=(self.width, self.height - 30))
-
-                self.canvas.delete("all")
-                # 注意：CTkCanvas不支持直接显示CTkImage，这里保持原方式
-                from PIL import ImageTk
-                tk_img = ImageTk.PhotoImage(image=pil_img)
-                self.canvas.create_image(0, 0, image=tk_img, anchor="nw")
-                self.canvas.tk_img = tk_img  # 保持引用
+                # 采集线程已提供预览尺寸的缩略图时无需再缩放
+                if frame.shape[1::-1] != self.preview_size:
+                    frame = cv2.resize(frame, self.preview_size, dst=self._resized)
+
+                # 由Pillow在解包时完成BGR→RGB，省去单独的cvtColor
+                pil_img = Image.frombuffer("RGB", self.preview_size, frame, "raw", "BGR", 0, 1)
+                self._tk_img.paste(pil_img)
             except Exception as e:
                 logger.error(f"更新预览错误: {e}")
 
@@ -450,6 +837,7 @@ class WatermarkGenerator:
         # 水印位置 (x, y) - 百分比坐标 (0.0-1.0)
         self.position_x = 0.02  # 2% from left
         self.position_y = 0.02  # 2% from top
+        self._update_position_text()
 
         # 字体设置
         self._init_fonts()
@@ -458,6 +846,13 @@ class WatermarkGenerator:
         self.dragging = False
         self.drag_start_pos = (0, 0)
 
+        # 水印贴图缓存：内容不变时复用，避免每帧重新栅格化
+        self._sprite_key = None
+        self._sprite = None
+
+        # 字形缓存 {(字体, 字符): (灰度位图, 前进宽度, 包围盒)}，每个字符只栅格化一次
+        self._glyph_cache = {}
+
         # 控制日志输出频率
         self.last_log_time = 0
 
@@ -509,6 +904,12 @@ class WatermarkGenerator:
         """设置水印位置（百分比坐标）"""
         self.position_x = max(0.0, min(1.0, x_percent))
         self.position_y = max(0.0, min(1.0, y_percent))
+        self._update_position_text()
+
+    def _update_position_text(self):
+        """缓存位置的百分比显示文本（保留一位小数），供界面直接读取"""
+        self.pos_x_text = f"{self.position_x * 100:.1f}"
+        self.pos_y_text = f"{self.position_y * 100:.1f}"
 
     def update_stats(self, pill_count):
         """更新统计信息 - 必须严格等于目标片数"""
@@ -525,21 +926,21 @@ class WatermarkGenerator:
             if pill_count == self.target_pills:  # 严格等于
                 if not self.target_reached:
                     # 第一次达到目标片数
+                    current_time = time.time()
                     self.target_reached = True
-                    self.target_start_time = time.time()
+                    self.target_start_time = current_time
                     self.target_stable_seconds = random.randint(2, 5)  # 随机2-5秒，缩短时间
                     self.notification_triggered = False  # 重置触发标志
                     self.success_message_shown = False
-                    current_time = time.time()
                     if current_time - self.last_log_time > 10:
                         logger.info(f"达到目标片数 {self.target_pills}，需要稳定 {self.target_stable_seconds} 秒")
                         self.last_log_time = current_time
                 elif not self.success_message_shown and not self.notification_triggered:
                     # 检查是否稳定足够时间
-                    elapsed = time.time() - self.target_start_time
+                    current_time = time.time()
+                    elapsed = current_time - self.target_start_time
                     if elapsed >= self.target_stable_seconds:
                         # 稳定时间足够，可以触发通知
-                        current_time = time.time()
                         if current_time - self.last_log_time > 10:
                             logger.info(f"稳定时间到达 {elapsed:.1f}秒 >= {self.target_stable_seconds}秒，触发通知")
                             self.last_log_time = current_time
@@ -613,67 +1014,204 @@ class WatermarkGenerator:
     def end_drag(self):
         """结束拖动"""
         self.dragging = False
+        self._update_position_text()
+
+    def _build_info_lines(self):
+        """生成水印文本行"""
+        # 获取当前时间
+        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        # 水印信息 - 修正：使用当前片数而不是最大片数
+        info_lines = [
+            f"时间: {current_time}",
+            f"当前片数: {self.current_pill_count}",
+            f"最高片数: {self.max_pill_count} (第{self.max_pill_frame}帧)",
+        ]
 
-    def add_watermark(self, frame, show_drag_rect=False):
-        """为帧添加水印（支持中文）"""
-        try:
-            height, width = frame.shape[:2]
+        # 添加目标片数信息
+        if self.target_pills > 0:
+            info_lines.append(f"目标片数: {self.target_pills}")
+            if self.target_reached and not self.success_message_shown:
+                elapsed = time.time() - self.target_start_time
+                remaining = max(0, self.target_stable_seconds - elapsed)
+                info_lines.append(f"稳定倒计时: {remaining:.1f}秒")
+            elif self.success_message_shown:
+                info_lines.append(f"{self.custom_text}{self.target_pills}片发药成功")
+                info_lines.append(f"成功时间: {self.success_timestamp}")
+
+        info_lines.append(f"{self.custom_text}")
+        return info_lines
+
+    def _line_style(self, i, line, line_count):
+        """确定文本行的字体和颜色"""
+        if i == 0:  # 时间行
+            return self.info_font, (255, 255, 0, 255)  # 黄色
+        if i >= line_count - 2:  # 最后两行
+            if "发药成功" in line:
+                return self.title_font, (0, 255, 0, 255)  # 成功消息用绿色
+            return self.title_font, (255, 255, 255, 255)  # 白色
+        if self.target_pills > 0 and i == line_count - 4:  # 目标片数行
+            if self.target_reached and not self.success_message_shown:
+                return self.small_font, (255, 165, 0, 255)  # 橙色（稳定中）
+            if self.success_message_shown:
+                return self.small_font, (0, 255, 0, 255)  # 绿色（成功）
+            return self.small_font, (255, 255, 255, 255)  # 白色
+        if self.target_reached and not self.success_message_shown and i == line_count - 3:  # 倒计时行
+            return self.small_font, (255, 165, 0, 255)  # 橙色
+        return self.small_font, (200, 200, 200, 255)  # 浅灰色
+
+    def _glyph(self, ch, font):
+        """获取字符的灰度位图（原点位于左上角）、前进宽度和包围盒，未命中时栅格化并缓存"""
+        key = (font, ch)
+        glyph = self._glyph_cache.get(key)
+        if glyph is None:
+            bbox = font.getbbox(ch)
+            mask = Image.new('L', (max(bbox[2], 1), max(bbox[3], 1)), 0)
+            ImageDraw.Draw(mask).text((0, 0), ch, font=font, fill=255)
+            glyph = (np.asarray(mask, dtype=np.float32) / 255.0, font.getlength(ch), bbox)
+            self._glyph_cache[key] = glyph
+        return glyph
+
+    def _text_bbox(self, text, font):
+        """由缓存的字形度量计算整行文本的包围盒 (left, top, right, bottom)"""
+        left = top = float("inf")
+        right = bottom = float("-inf")
+        x = 0.0
+        for ch in text:
+            _, advance, (gl, gt, gr, gb) = self._glyph(ch, font)
+            left, top = min(left, x + gl), min(top, gt)
+            right, bottom = max(right, x + gr), max(bottom, gb)
+            x += advance
+        if left == float("inf"):
+            return 0, 0, 0, 0
+        return int(left), int(top), int(round(right)), int(bottom)
+
+    def _draw_text(self, canvas, x, y, text, font, color):
+        """将文本逐字形混合到RGBA浮点画布上：out = color * m + out * (1 - m)
+
+        与Pillow在RGBA图上绘制文本的规则一致：完全透明的像素直接取文字颜色
+        """
+        canvas_h, canvas_w = canvas.shape[:2]
+        color = np.asarray(color, dtype=np.float32)
+        pen_x = float(x)
+        for ch in text:
+            mask, advance, _ = self._glyph(ch, font)
+            gx = int(round(pen_x))
+            pen_x += advance
+
+            h = min(mask.shape[0], canvas_h - y)
+            w = min(mask.shape[1], canvas_w - gx)
+            if h <= 0 or w <= 0:
+                continue
+            m = mask[:h, :w, None]
+            region = canvas[y:y + h, gx:gx + w]
+            region[region[..., 3] == 0, :3] = color[:3]
+            region += (color - region) * m
+
+    def _render_sprite(self, info_lines, show_drag_rect):
+        """将水印栅格化为小尺寸RGBA贴图
+
+        返回 (背景宽, 背景高, 预乘颜色, 1-alpha)，颜色为BGR顺序的float32数组
+        """
+        styles = [self._line_style(i, line, len(info_lines)) for i, line in enumerate(info_lines)]
+
+        # 计算水印背景大小
+        max_line_width = 0
+        total_height = 0
+        line_heights = []
+
+        for line, (font, _) in zip(info_lines, styles):
+            bbox = self._text_bbox(line, font)
+            line_width = bbox[2] - bbox[0]
+            line_height = bbox[3] - bbox[1]
+
+            max_line_width = max(max_line_width, line_width)
+            line_heights.append(line_height)
+            total_height += line_height + 5  # 5px行间距
+
+        bg_width = max_line_width + 20
+        bg_height = total_height + 20
+
+        # 贴图四周留出拖动指示框的2px边距
+        margin = 2
+        sprite_w = bg_width + 2 * margin + 1
+        sprite_h = bg_height + 2 * margin + 1
+
+        hint_text = "拖动水印位置"
+        if show_drag_rect:
+            hint_bbox = self._text_bbox(hint_text, self.small_font)
+            sprite_w = max(sprite_w, margin + 5 + hint_bbox[2])
+            sprite_h = max(sprite_h, margin + bg_height + 5 + hint_bbox[3])
+
+        sprite = np.zeros((sprite_h, sprite_w, 4), dtype=np.float32)
+
+        # 绘制半透明背景（半透明黑色）
+        sprite[margin:margin + bg_height + 1, margin:margin + bg_width + 1] = (0, 0, 0, 180)
+
+        # 绘制拖动指示框（如果正在拖动），线宽2px
+        if show_drag_rect:
+            red = (255, 0, 0, 255)
+            right, bottom = bg_width + 2 * margin, bg_height + 2 * margin
+            sprite[0:2, 0:right + 1] = red
+            sprite[bottom - 1:bottom + 1, 0:right + 1] = red
+            sprite[0:bottom + 1, 0:2] = red
+            sprite[0:bottom + 1, right - 1:right + 1] = red
+            # 绘制拖动提示文本
+            self._draw_text(sprite, margin + 5, margin + bg_height + 5, hint_text, self.small_font, red)
+
+        # 绘制文本
+        current_y = margin + 10
+        for line, (font, color), line_height in zip(info_lines, styles, line_heights):
+            self._draw_text(sprite, margin + 10, current_y, line, font, color)
+            current_y += line_height + 5
+
+        # 预计算混合系数：out = premul + roi * inv_alpha
+        alpha = sprite[..., 3:4] / 255.0
+        premul = sprite[..., 2::-1] * alpha + 0.5  # RGB→BGR，+0.5用于取整
+        inv_alpha = 1.0 - alpha
+        return bg_width, bg_height, premul, inv_alpha
 
-            # 将OpenCV图像转换为PIL图像以便绘制中文
-            pil_img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-            draw = ImageDraw.Draw(pil_img, 'RGBA')
+    @staticmethod
+    def _blend_sprite(frame, premul, inv_alpha, x, y):
+        """将贴图按alpha混合到帧的对应区域（原地修改，自动裁剪越界部分）"""
+        frame_h, frame_w = frame.shape[:2]
+        sprite_h, sprite_w = premul.shape[:2]
+
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + sprite_w, frame_w), min(y + sprite_h, frame_h)
+        if x0 >= x1 or y0 >= y1:
+            return
 
-            # 获取当前时间
-            current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        roi = frame[y0:y1, x0:x1]
+        sx, sy = x0 - x, y0 - y
+        premul = premul[sy:sy + (y1 - y0), sx:sx + (x1 - x0)]
+        inv_alpha = inv_alpha[sy:sy + (y1 - y0), sx:sx + (x1 - x0)]
+        if NUMBA_AVAILABLE:
+            _blend_roi_jit(roi, premul, inv_alpha)
+            return
 
-            # 水印信息 - 修正：使用当前片数而不是最大片数
-            info_lines = [
-                f"时间: {current_time}",
-                f"当前片数: {self.current_pill_count}",
-                f"最高片数: {self.max_pill_count} (第{self.max_pill_frame}帧)",
-            ]
+        blended = roi * inv_alpha
+        blended += premul
+        roi[:] = blended
 
-            # 添加目标片数信息
-            if self.target_pills > 0:
-                info_lines.append(f"目标片数: {self.target_pills}")
-                if self.target_reached and not self.success_message_shown:
-                    elapsed = time.time() - self.target_start_time
-                    remaining = max(0, self.target_stable_seconds - elapsed)
-                    info_lines.append(f"稳定倒计时: {remaining:.1f}秒")
-                elif self.success_message_shown:
-                    info_lines.append(f"{self.custom_text}{self.target_pills}片发药成功")
-                    info_lines.append(f"成功时间: {self.success_timestamp}")
+    def add_watermark(self, frame, show_drag_rect=False):
+        """为帧添加水印（支持中文），直接在传入的帧上绘制"""
+        try:
+            height, width = frame.shape[:2]
 
-            info_lines.append(f"{self.custom_text}")
+            info_lines = self._build_info_lines()
+
+            # 仅在文本或状态变化时重新栅格化贴图
+            sprite_key = (tuple(info_lines), show_drag_rect, self.target_reached, self.success_message_shown)
+            if sprite_key != self._sprite_key:
+                self._sprite = self._render_sprite(info_lines, show_drag_rect)
+                self._sprite_key = sprite_key
+            bg_width, bg_height, premul, inv_alpha = self._sprite
 
             # 计算水印位置（像素坐标）
             pos_x = int(width * self.position_x)
             pos_y = int(height * self.position_y)
 
-            # 计算水印背景大小
-            max_line_width = 0
-            total_height = 0
-            line_heights = []
-
-            for i, line in enumerate(info_lines):
-                if i == 0:  # 时间行
-                    bbox = draw.textbbox((0, 0), line, font=self.info_font)
-                elif i >= len(info_lines) - 2:  # 最后两行
-                    bbox = draw.textbbox((0, 0), line, font=self.title_font)
-                else:  # 其他信息行
-                    bbox = draw.textbbox((0, 0), line, font=self.small_font)
-
-                line_width = bbox[2] - bbox[0]
-                line_height = bbox[3] - bbox[1]
-
-                max_line_width = max(max_line_width, line_width)
-                line_heights.append(line_height)
-                total_height += line_height + 5  # 5px行间距
-
-            # 添加水印背景（半透明黑色）
-            bg_width = max_line_width + 20
-            bg_height = total_height + 20
-
             # 确保水印在图像范围内
             if pos_x + bg_width > width:
                 pos_x = width - bg_width - 10
@@ -684,58 +1222,8 @@ class WatermarkGenerator:
             if pos_y < 0:
                 pos_y = 10
 
-            # 绘制半透明背景
-            bg_color = (0, 0, 0, 180)  # 半透明黑色
-            draw.rectangle(
-                [pos_x, pos_y, pos_x + bg_width, pos_y + bg_height],
-                fill=bg_color
-            )
-
-            # 绘制拖动指示框（如果正在拖动）
-            if show_drag_rect:
-                draw.rectangle(
-                    [pos_x - 2, pos_y - 2, pos_x + bg_width + 2, pos_y + bg_height + 2],
-                    outline=(255, 0, 0, 255),
-                    width=2
-                )
-                # 绘制拖动提示文本
-                draw.text((pos_x + 5, pos_y + bg_height + 5),
-                          "拖动水印位置",
-                          font=self.small_font,
-                          fill=(255, 0, 0, 255))
-
-            # 绘制文本
-            current_y = pos_y + 10
-            for i, line in enumerate(info_lines):
-                if i == 0:  # 时间行
-                    font = self.info_font
-                    color = (255, 255, 0, 255)  # 黄色
-                elif i >= len(info_lines) - 2:  # 最后两行
-                    font = self.title_font
-                    if "发药成功" in line:
-                        color = (0, 255, 0, 255)  # 成功消息用绿色
-                    else:
-                        color = (255, 255, 255, 255)  # 白色
-                elif self.target_pills > 0 and i == len(info_lines) - 4:  # 目标片数行
-                    font = self.small_font
-                    if self.target_reached and not self.success_message_shown:
-                        color = (255, 165, 0, 255)  # 橙色（稳定中）
-                    elif self.success_message_shown:
-                        color = (0, 255, 0, 255)  # 绿色（成功）
-                    else:
-                        color = (255, 255, 255, 255)  # 白色
-                elif self.target_reached and not self.success_message_shown and i == len(info_lines) - 3:  # 倒计时行
-                    font = self.small_font
-                    color = (255, 165, 0, 255)  # 橙色
-                else:  # 其他信息行
-                    font = self.small_font
-                    color = (200, 200, 200, 255)  # 浅灰色
-
-                draw.text((pos_x + 10, current_y), line, font=font, fill=color)
-                current_y += line_heights[i] + 5
-
-            # 转换回OpenCV图像
-            frame = cv2.cvtColor(np.array(pil_img), cv2.COLOR_RGB2BGR)
+            # 贴图含2px边距，左上角相对背景偏移(-2, -2)
+            self._blend_sprite(frame, premul, inv_alpha, pos_x - 2, pos_y - 2)
 
             return frame
 
@@ -749,6 +1237,8 @@ class WatermarkPositionDialog(ctk.CTkToplevel):
 
     def __init__(self, parent, watermark_generator):
         super().__init__(parent)
+        # 构建控件期间先隐藏窗口，完成后一次性布局显示
+        self.withdraw()
         self.watermark = watermark_generator
         self.parent = parent
 
@@ -757,15 +1247,29 @@ class WatermarkPositionDialog(ctk.CTkToplevel):
         self.minsize(450, 400)  # 设置最小大小
         self.resizable(True, True)  # 允许调整大小
 
-        # 使对话框模态
         self.transient(parent)
-        self.grab_set()
 
         # 配置网格权重
         self.grid_columnconfigure(0, weight=1)
         self.grid_rowconfigure(0, weight=1)
 
+        # 滑块拖动时合并频繁的位置更新
+        self._pending_update = None
+        # 滑块按住期间只做快速预览，松开后再完整刷新
+        self._slider_dragging = False
+        # 程序内部批量设置滑块时忽略滑块回调
+        self._suppress_update = False
+        # 上次显示的文本，未变化时跳过控件刷新
+        self._last_x_text = None
+        self._last_y_text = None
+        self._last_pos_text = None
+
         self._setup_ui()
+        self.deiconify()
+
+        # 使对话框模态：deiconify不会同步映射窗口，需等窗口可见后才能抓取输入
+        self.wait_visibility()
+        self.grab_set()
 
     def _setup_ui(self):
         """设置对话框UI"""
@@ -778,7 +1282,7 @@ class WatermarkPositionDialog(ctk.CTkToplevel):
         ctk.CTkLabel(
             main_container,
             text="⚙️ 水印位置设置",
-            font=("Arial", 16, "bold")
+            font=self.parent.font(16, "bold")
         ).pack(pady=(0, 20))
 
         # 位置设置框架
@@ -789,7 +1293,7 @@ class WatermarkPositionDialog(ctk.CTkToplevel):
         x_frame = ctk.CTkFrame(pos_frame)
         x_frame.pack(fill="x", padx=10, pady=10)
 
-        ctk.CTkLabel(x_frame, text="水平位置 (左← →右):", font=("Arial", 12)).pack(anchor="w", pady=(0, 5))
+        ctk.CTkLabel(x_frame, text="水平位置 (左← →右):", font=self.parent.font(12)).pack(anchor="w", pady=(0, 5))
 
         x_slider_frame = ctk.CTkFrame(x_frame)
         x_slider_frame.pack(fill="x", pady=5)
@@ -805,15 +1309,17 @@ class WatermarkPositionDialog(ctk.CTkToplevel):
         )
         self.x_slider.grid(row=0, column=0, padx=(0, 10), pady=5, sticky="ew")
         self.x_slider.set(self.watermark.position_x * 100)
+        self.x_slider.bind("<ButtonPress-1>", self._on_slider_press)
+        self.x_slider.bind("<ButtonRelease-1>", self._on_slider_release)
 
-        self.x_value_label = ctk.CTkLabel(x_slider_frame, text=f"{self.watermark.position_x * 100:.1f}%", width=60)
+        self.x_value_label = ctk.CTkLabel(x_slider_frame, text=f"{self.watermark.pos_x_text}%", width=60)
         self.x_value_label.grid(row=0, column=1, pady=5)
 
         # Y轴位置
         y_frame = ctk.CTkFrame(pos_frame)
         y_frame.pack(fill="x", padx=10, pady=10)
 
-        ctk.CTkLabel(y_frame, text="垂直位置 (上← →下):", font=("Arial", 12)).pack(anchor="w", pady=(0, 5))
+        ctk.CTkLabel(y_frame, text="垂直位置 (上← →下):", font=self.parent.font(12)).pack(anchor="w", pady=(0, 5))
 
         y_slider_frame = ctk.CTkFrame(y_frame)
         y_slider_frame.pack(fill="x", pady=5)
@@ -829,15 +1335,17 @@ class WatermarkPositionDialog(ctk.CTkToplevel):
         )
         self.y_slider.grid(row=0, column=0, padx=(0, 10), pady=5, sticky="ew")
         self.y_slider.set(self.watermark.position_y * 100)
+        self.y_slider.bind("<ButtonPress-1>", self._on_slider_press)
+        self.y_slider.bind("<ButtonRelease-1>", self._on_slider_release)
 
-        self.y_value_label = ctk.CTkLabel(y_slider_frame, text=f"{self.watermark.position_y * 100:.1f}%", width=60)
+        self.y_value_label = ctk.CTkLabel(y_slider_frame, text=f"{self.watermark.pos_y_text}%", width=60)
         self.y_value_label.grid(row=0, column=1, pady=5)
 
         # 预设位置按钮
         preset_frame = ctk.CTkFrame(main_container)
         preset_frame.pack(fill="x", padx=10, pady=10)
 
-        ctk.CTkLabel(preset_frame, text="预设位置:", font=("Arial", 12)).pack(anchor="w", pady=(0, 5))
+        ctk.CTkLabel(preset_frame, text="预设位置:", font=self.parent.font(12)).pack(anchor="w", pady=(0, 5))
 
         # 第一行按钮
         btn_frame1 = ctk.CTkFrame(preset_frame)
@@ -880,7 +1388,7 @@ class WatermarkPositionDialog(ctk.CTkToplevel):
         manual_frame = ctk.CTkFrame(main_container)
         manual_frame.pack(fill="x", padx=10, pady=10)
 
-        ctk.CTkLabel(manual_frame, text="手动输入位置:", font=("Arial", 12)).pack(anchor="w", pady=(0, 5))
+        ctk.CTkLabel(manual_frame, text="手动输入位置:", font=self.parent.font(12)).pack(anchor="w", pady=(0, 5))
 
         input_frame = ctk.CTkFrame(manual_frame)
         input_frame.pack(fill="x", pady=5)
@@ -912,22 +1420,22 @@ class WatermarkPositionDialog(ctk.CTkToplevel):
             text="启用鼠标拖动模式",
             variable=self.drag_mode_var,
             command=self._toggle_drag_mode,
-            font=("Arial", 12)
+            font=self.parent.font(12)
         )
         drag_check.pack(anchor="w", pady=5)
 
         ctk.CTkLabel(
             drag_frame,
             text="提示：启用后可在视频画布上直接拖动水印",
-            font=("Arial", 10),
+            font=self.parent.font(10),
             text_color="#666666"
         ).pack(anchor="w", pady=(0, 5))
 
         # 当前坐标显示
         self.pos_label = ctk.CTkLabel(
             main_container,
-            text=f"当前位置: X={self.watermark.position_x * 100:.1f}%, Y={self.watermark.position_y * 100:.1f}%",
-            font=("Arial", 11, "bold")
+            text=f"当前位置: X={self.watermark.pos_x_text}%, Y={self.watermark.pos_y_text}%",
+            font=self.parent.font(11, "bold")
         )
         self.pos_label.pack(pady=10)
 
@@ -959,61 +1467,98 @@ class WatermarkPositionDialog(ctk.CTkToplevel):
             height=35
         ).pack(side="right", padx=5)
 
-    def _update_position(self, value=None):
-        """更新位置"""
+    def _update_position(self, value=None, from_entry=False):
+        """更新位置（防抖：30ms内的连续调用只执行最后一次）"""
+        if self._suppress_update:
+            return
+        if self._pending_update is not None:
+            self.after_cancel(self._pending_update)
+        self._pending_update = self.after(30, self._do_update_position, not from_entry)
+
+    def _on_slider_press(self, event):
+        """滑块按下，进入快速预览"""
+        self._slider_dragging = True
+
+    def _on_slider_release(self, event):
+        """滑块松开，完整刷新一次"""
+        self._slider_dragging = False
+        self._update_position()
+
+    def _do_update_position(self, update_entries=True):
+        """执行位置更新，来源为手动输入框时不回写输入框"""
+        self._pending_update = None
         x_percent = self.x_slider.get() / 100.0
         y_percent = self.y_slider.get() / 100.0
 
         self.watermark.set_position(x_percent, y_percent)
-        self.x_value_label.configure(text=f"{x_percent * 100:.1f}%")
-        self.y_value_label.configure(text=f"{y_percent * 100:.1f}%")
-        self.pos_label.configure(
-            text=f"当前位置: X={x_percent * 100:.1f}%, Y={y_percent * 100:.1f}%"
-        )
 
-        # 更新手动输入框
-        self.x_entry.delete(0, "end")
-        self.x_entry.insert(0, f"{x_percent * 100:.1f}")
-        self.y_entry.delete(0, "end")
-        self.y_entry.insert(0, f"{y_percent * 100:.1f}")
+        # 显示精度为0.1%，文本相同则不触发Tk刷新
+        x_text = self.watermark.pos_x_text
+        y_text = self.watermark.pos_y_text
+        if x_text != self._last_x_text:
+            self.x_value_label.configure(text=f"{x_text}%")
+            self._last_x_text = x_text
+        if y_text != self._last_y_text:
+            self.y_value_label.configure(text=f"{y_text}%")
+            self._last_y_text = y_text
+
+        # 拖动中只更新水印位置和滑块数值，当前坐标与输入框等松开后再刷新
+        if self._slider_dragging:
+            return
+        pos_text = f"当前位置: X={x_text}%, Y={y_text}%"
+        if pos_text != self._last_pos_text:
+            self.pos_label.configure(text=pos_text)
+            self._last_pos_text = pos_text
+
+        # 更新手动输入框（内容一致时不重写）
+        if update_entries:
+            if self.x_entry.get().strip() != x_text:
+                self.x_entry.delete(0, "end")
+                self.x_entry.insert(0, x_text)
+            if self.y_entry.get().strip() != y_text:
+                self.y_entry.delete(0, "end")
+                self.y_entry.insert(0, y_text)
+
+    def _set_sliders(self, x_percent, y_percent, from_entry=False):
+        """同时设置两个滑块，只触发一次位置更新"""
+        self._suppress_update = True
+        try:
+            self.x_slider.set(x_percent * 100)
+            self.y_slider.set(y_percent * 100)
+        finally:
+            self._suppress_update = False
+        self._update_position(from_entry=from_entry)
 
     def _set_preset_position(self, x, y):
         """设置预设位置"""
-        self.x_slider.set(x * 100)
-        self.y_slider.set(y * 100)
-        self._update_position()
+        self._set_sliders(x, y)
 
     def _apply_manual_position(self):
         """应用手动输入的位置"""
-        try:
-            x_str = self.x_entry.get().strip()
-            y_str = self.y_entry.get().strip()
-
-            if x_str and y_str:
-                x_percent = float(x_str) / 100.0
-                y_percent = float(y_str) / 100.0
-
-                # 限制范围
-                x_percent = max(0.0, min(1.0, x_percent))
-                y_percent = max(0.0, min(1.0, y_percent))
-
-                self.x_slider.set(x_percent * 100)
-                self.y_slider.set(y_percent * 100)
-                self._update_position()
+        x_str = self.x_entry.get().strip()
+        y_str = self.y_entry.get().strip()
+        if not x_str or not y_str:
+            return
 
-        except ValueError:
+        x_value = _parse_number(x_str)
+        y_value = _parse_number(y_str)
+        if x_value is None or y_value is None:
             messagebox.showerror("错误", "请输入有效的数字")
+            return
+
+        # 限制范围
+        x_percent = max(0.0, min(1.0, x_value / 100.0))
+        y_percent = max(0.0, min(1.0, y_value / 100.0))
+        self._set_sliders(x_percent, y_percent, from_entry=True)
 
     def _reset_position(self):
         """重置位置到默认"""
-        self.watermark.set_position(0.02, 0.02)
-        self.x_slider.set(2.0)
-        self.y_slider.set(2.0)
-        self._update_position()
+        self._set_sliders(0.02, 0.02)
 
     def _save_settings(self):
         """保存设置"""
-        self.parent._save_watermark_config()
+        self.parent._mark_dirty("watermark")
+        self.parent._flush_configs()
         messagebox.showinfo("成功", "水印设置已保存")
 
     def _toggle_drag_mode(self):
@@ -1023,12 +1568,31 @@ class WatermarkPositionDialog(ctk.CTkToplevel):
         else:
             self.parent.enable_watermark_drag(False)
 
+    def destroy(self):
+        """关闭对话框前取消未执行的位置更新"""
+        if self._pending_update is not None:
+            self.after_cancel(self._pending_update)
+            self._pending_update = None
+        super().destroy()
+
 
 class PillDetectorApp(ctk.CTk):
     """药片检测计数系统 - 主应用类"""
 
+    # 推理输入长边（与YOLOv8默认imgsz一致）
+    INFER_SIZE = 640
+
+    # 摄像头探测结果缓存有效期（秒），过期后在后台重新探测
+    CAMERA_CACHE_SECONDS = 600
+
+    # 临时目录中最多保留的解密模型数量（退出时全部清理）
+    DECRYPT_CACHE_LIMIT = 4
+
     def __init__(self):
         super().__init__()
+        # 构建控件期间先隐藏主窗口，完成后一次性布局显示
+        self.withdraw()
+        self._fonts = {}  # 共享字体缓存 {(字号, 粗细): CTkFont}
 
         # 应用基础设置
         self.title("药片检测计数系统")
@@ -1037,6 +1601,7 @@ class PillDetectorApp(ctk.CTk):
 
         # 核心变量
         self.camera_thread = None
+        self.inference_thread = None
         self.current_model = None
         self.current_model_name = ""
         self.models = {}  # 模型配置 {name: path}
@@ -1045,13 +1610,33 @@ class PillDetectorApp(ctk.CTk):
         self.video_writer = None
         self.save_dir = ""
         self.current_frame = None
+        self.last_detections = None  # current_frame对应的检测结果 (检测框, 置信度)，截图时复用
+        self._hash_gray = np.empty((32, 32), dtype=np.uint8)  # 重复帧判断用的灰度缩略图缓冲区（推理线程专用）
+        self._last_frame_key = None  # 上一帧的 (缩略图CRC32, 模型, 阈值)
+        self._last_frame_detections = None
+        self._frame_buf = None  # current_frame的复用缓冲区（原始帧，不含检测框和水印）
+        self._display_buf = np.empty((600, 800, 3), dtype=np.uint8)  # 缩放到画布尺寸的显示缓冲区
+        self._video_photo = None  # 主画面PhotoImage，逐帧paste复用
+        self._video_item = None  # 主画面在画布上的图元ID
+        self._video_hidden = False  # 摄像头关闭时隐藏画面图元
+        self._inference_lock = threading.Lock()  # 推理线程与界面线程（截图、预热）共用模型
+        self.conf_threshold = 0.5  # 置信度阈值，供推理线程读取（不在子线程访问Tk变量）
+        self._conf_text = "0.50"  # 置信度标签当前显示的文本
+
+        # 配置写盘合并：标记修改后延迟统一写入
+        self._dirty = {"models": False, "watermark": False, "target": False}
+        self._flush_handle = None
+        self._config_writer = ThreadPoolExecutor(max_workers=1)  # 配置写盘线程，不阻塞界面
+
         self.temp_models_dir = Path.home() / "PillDetectorTemp"
         self.temp_models_dir.mkdir(exist_ok=True)
 
         # 控制日志输出频率
-        self.last_detection_log_time = 0  # 记录上次检测日志时间
+        self.last_detection_log_time = 0  # 记录上次错误日志时间
+        self.last_fps_time = time.perf_counter()  # 记录上次帧率统计时间
         self.last_frame_count = 0  # 记录上次帧数
         self.frame_counter = 0  # 帧计数器
+        self._render_ms = deque(maxlen=128)  # 最近的界面绘制耗时(ms)
 
         # 音频管理器（修复版）
         self.audio_manager = AudioManager()
@@ -1059,6 +1644,10 @@ class PillDetectorApp(ctk.CTk):
         # 水印生成器
         self.watermark = WatermarkGenerator()
         self.watermark_drag_enabled = False
+        # 拖动事件节流：最多60Hz处理一次，期间只保留最新事件
+        self._last_drag_ts = 0.0
+        self._pending_drag_event = None
+        self._drag_flush_id = None
 
         # 水印位置对话框
         self.watermark_dialog = None
@@ -1075,14 +1664,25 @@ class PillDetectorApp(ctk.CTk):
         self.models_config_path = self.config_dir / "models.json"
         self.watermark_config_path = self.config_dir / "watermark.json"
         self.target_config_path = self.config_dir / "target.json"
+        self.cameras_config_path = self.config_dir / "cameras.json"
 
-        # 初始化UI - 必须先初始化UI再加载配置
-        self._setup_ui()
+        # 配置文件在线程池中读取解析，与UI构建并行；结果在主线程应用
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            models_future = pool.submit(_read_json, self.models_config_path)
+            watermark_future = pool.submit(_read_json, self.watermark_config_path)
+            target_future = pool.submit(_read_json, self.target_config_path)
 
-        # 加载已有配置
-        self._load_models_config()
-        self._load_watermark_config()
-        self._load_target_config()
+            # 初始化UI - 必须先初始化UI再加载配置
+            self._setup_ui()
+
+            # 加载已有配置
+            self._load_models_config(models_future)
+            self._load_watermark_config(watermark_future)
+            self._load_target_config(target_future)
+
+        # 摄像头列表缓存过期时在后台重新探测，不阻塞窗口显示
+        if not self._cameras_cache_fresh:
+            threading.Thread(target=self._probe_cameras_bg, daemon=True).start()
 
         # 绑定键盘事件
         self._bind_keyboard_events()
@@ -1090,12 +1690,26 @@ class PillDetectorApp(ctk.CTk):
         # 绑定鼠标事件
         self._bind_mouse_events()
 
+        # 推理线程有新结果时刷新画面
+        self.bind("<<NewFrame>>", self._update_video)
+
+        self.deiconify()
+
         # 启动时自动刷新模型列表
         self.after(100, self._auto_load_models)
 
         # 设置退出时清理
         self.protocol("WM_DELETE_WINDOW", self._on_closing)
 
+    def font(self, size, weight="normal"):
+        """返回共享的Arial字体对象，相同字号与粗细只创建一次"""
+        key = (size, weight)
+        font = self._fonts.get(key)
+        if font is None:
+            font = ctk.CTkFont(family="Arial", size=size, weight=weight)
+            self._fonts[key] = font
+        return font
+
     def _setup_ui(self):
         """设置UI界面 - 与训练端统一风格"""
         # 创建分页面框架
@@ -1107,15 +1721,38 @@ class PillDetectorApp(ctk.CTk):
         self.notebook.add(self.detect_frame, text="🔍 实时检测")
         self._setup_detect_page()
 
-        # 模型管理页面
+        # 模型管理页面（首次切换到该页时再构建控件）
         self.models_frame = ctk.CTkFrame(self.notebook)
         self.notebook.add(self.models_frame, text="📦 模型管理")
-        self._setup_models_page()
 
-        # 设置页面
+        # 设置页面（首次切换到该页时再构建控件）
         self.settings_frame = ctk.CTkFrame(self.notebook)
         self.notebook.add(self.settings_frame, text="⚙️ 系统设置")
-        self._setup_settings_page()
+
+        self._tabs_built = {"detect": True, "models": False, "settings": False}
+        self._pending_model_select = False
+        self._model_loading = False  # 模型页构建前也可能在后台加载模型
+        self._listbox_snapshot = []  # 模型列表框当前显示的名称
+        self.notebook.bind("<<NotebookTabChanged>>", self._on_tab_changed)
+
+    def _on_tab_changed(self, event=None):
+        """分页切换事件 - 按需构建尚未创建的页面"""
+        try:
+            index = self.notebook.index("current")
+            if index == 1 and not self._tabs_built["models"]:
+                self._setup_models_page()
+                self._tabs_built["models"] = True
+                self._update_models_list()
+                if self._pending_model_select and self.models:
+                    self.models_listbox.select_set(0)
+                self._pending_model_select = False
+                if self._model_loading:
+                    self._set_model_loading(True)
+            elif index == 2 and not self._tabs_built["settings"]:
+                self._setup_settings_page()
+                self._tabs_built["settings"] = True
+        except Exception as e:
+            logger.error(f"构建分页失败: {e}")
 
     def _setup_detect_page(self):
         """设置检测页面"""
@@ -1140,8 +1777,8 @@ class PillDetectorApp(ctk.CTk):
 
         ctk.CTkLabel(cam_frame, text="摄像头：").pack(side="left", padx=(5, 2), pady=2)
 
-        # 检测可用摄像头
-        self.available_cameras = self._detect_cameras()
+        # 可用摄像头（先使用缓存结果，探测在后台进行）
+        self.available_cameras = self._load_cameras_cache()
         cam_options = [f"摄像头 {i}" for i in self.available_cameras] if self.available_cameras else ["无可用摄像头"]
         self.cam_combo = ctk.CTkComboBox(
             cam_frame,
@@ -1179,7 +1816,7 @@ class PillDetectorApp(ctk.CTk):
         self.current_model_label = ctk.CTkLabel(
             model_display_frame,
             text="未加载",
-            font=("Arial", 10, "bold"),
+            font=self.font(10, "bold"),
             text_color="#4a90e2"
         )
         self.current_model_label.pack(side="left", padx=2, pady=2)
@@ -1202,14 +1839,14 @@ class PillDetectorApp(ctk.CTk):
         ctk.CTkLabel(
             count_frame,
             text="🎯 检测结果",
-            font=("Arial", 12, "bold")
+            font=self.font(12, "bold")
         ).pack(side="left", padx=(10, 20), pady=10)
 
         ctk.CTkLabel(count_frame, text="药片数量：").pack(side="left", padx=5, pady=10)
         self.count_label = ctk.CTkLabel(
             count_frame,
             text="0",
-            font=("Arial", 24, "bold"),
+            font=self.font(24, "bold"),
             text_color="red"
         )
         self.count_label.pack(side="left", padx=5, pady=10)
@@ -1226,7 +1863,7 @@ class PillDetectorApp(ctk.CTk):
         ctk.CTkLabel(
             detect_ctrl_frame,
             text="🎛️ 检测控制",
-            font=("Arial", 14, "bold")
+            font=self.font(14, "bold")
         ).pack(pady=(0, 10))
 
         # 检测按钮
@@ -1263,7 +1900,7 @@ class PillDetectorApp(ctk.CTk):
         ctk.CTkLabel(
             target_frame,
             text="🎯 目标片数设置",
-            font=("Arial", 14, "bold")
+            font=self.font(14, "bold")
         ).pack(pady=(0, 10))
 
         # 目标片数输入
@@ -1273,10 +1910,10 @@ class PillDetectorApp(ctk.CTk):
         ctk.CTkLabel(target_input_frame, text="目标片数：").pack(side="left", padx=(5, 2), pady=5)
         self.target_entry = ctk.CTkEntry(
             target_input_frame,
-            textvariable=self.target_pills_var,
             width=80,
             placeholder_text="0表示禁用"
         )
+        self.target_entry.insert(0, str(self.target_pills_var.get()))
         self.target_entry.pack(side="left", padx=2, pady=5)
 
         # 绑定事件，处理空值
@@ -1294,7 +1931,7 @@ class PillDetectorApp(ctk.CTk):
         self.target_status_label = ctk.CTkLabel(
             target_frame,
             text="目标片数: 未设置",
-            font=("Arial", 10),
+            font=self.font(10),
             text_color="gray"
         )
         self.target_status_label.pack(pady=5)
@@ -1306,7 +1943,7 @@ class PillDetectorApp(ctk.CTk):
         ctk.CTkLabel(
             record_frame,
             text="📹 录像控制",
-            font=("Arial", 14, "bold")
+            font=self.font(14, "bold")
         ).pack(pady=(0, 10))
 
         # 水印自定义文本
@@ -1368,13 +2005,13 @@ class PillDetectorApp(ctk.CTk):
         ctk.CTkLabel(
             status_frame,
             text="📊 状态信息",
-            font=("Arial", 14, "bold")
+            font=self.font(14, "bold")
         ).pack(pady=(0, 10))
 
         self.status_label = ctk.CTkLabel(
             status_frame,
             text="请先加载模型并打开摄像头",
-            font=("Arial", 10)
+            font=self.font(10)
         )
         self.status_label.pack(anchor="w", pady=5)
 
@@ -1391,7 +2028,7 @@ class PillDetectorApp(ctk.CTk):
         ctk.CTkLabel(
             scroll_container,
             text="📦 模型管理",
-            font=("Arial", 16, "bold")
+            font=self.font(16, "bold")
         ).pack(pady=(0, 20))
 
         # 模型导入区
@@ -1401,7 +2038,7 @@ class PillDetectorApp(ctk.CTk):
         ctk.CTkLabel(
             import_frame,
             text="导入模型",
-            font=("Arial", 12, "bold")
+            font=self.font(12, "bold")
         ).pack(pady=(10, 5))
 
         ctk.CTkLabel(import_frame, text="支持格式：.rp（加密模型）").pack(pady=5)
@@ -1427,7 +2064,7 @@ class PillDetectorApp(ctk.CTk):
         ctk.CTkLabel(
             list_frame,
             text="已加载模型",
-            font=("Arial", 12, "bold")
+            font=self.font(12, "bold")
         ).pack(pady=(10, 5))
 
         # 模型列表容器
@@ -1464,6 +2101,7 @@ class PillDetectorApp(ctk.CTk):
             ("🗑️ 删除模型", self._delete_model, 120),
         ]
 
+        self.model_buttons = []
         for text, command, width in buttons:
             btn = ctk.CTkButton(
                 btn_frame,
@@ -1472,6 +2110,10 @@ class PillDetectorApp(ctk.CTk):
                 width=width
             )
             btn.pack(side="left", padx=5, pady=5)
+            self.model_buttons.append(btn)
+
+        # 模型加载进度条（加载期间显示）
+        self.model_progress = ctk.CTkProgressBar(scroll_container, mode="indeterminate")
 
     def _setup_settings_page(self):
         """设置系统设置页面"""
@@ -1486,7 +2128,7 @@ class PillDetectorApp(ctk.CTk):
         ctk.CTkLabel(
             scroll_container,
             text="⚙️ 系统设置",
-            font=("Arial", 16, "bold")
+            font=self.font(16, "bold")
         ).pack(pady=(0, 20))
 
         # 临时文件清理
@@ -1496,13 +2138,13 @@ class PillDetectorApp(ctk.CTk):
         ctk.CTkLabel(
             temp_frame,
             text="临时文件管理",
-            font=("Arial", 12, "bold")
+            font=self.font(12, "bold")
         ).pack(pady=(10, 5))
 
         ctk.CTkLabel(
             temp_frame,
             text=f"临时目录：{self.temp_models_dir}",
-            font=("Arial", 10)
+            font=self.font(10)
         ).pack(pady=5)
 
         ctk.CTkButton(
@@ -1519,13 +2161,13 @@ class PillDetectorApp(ctk.CTk):
         ctk.CTkLabel(
             config_frame,
             text="配置文件",
-            font=("Arial", 12, "bold")
+            font=self.font(12, "bold")
         ).pack(pady=(10, 5))
 
         ctk.CTkLabel(
             config_frame,
             text=f"配置目录：{self.config_dir}",
-            font=("Arial", 10)
+            font=self.font(10)
         ).pack(pady=5)
 
         ctk.CTkButton(
@@ -1546,7 +2188,15 @@ class PillDetectorApp(ctk.CTk):
         ]
 
         for key, command in shortcuts:
-            self.bind(key, lambda e, cmd=command: cmd())
+            self.bind(key, self._make_shortcut_handler(command))
+
+    def _make_shortcut_handler(self, command):
+        """生成快捷键处理函数：焦点在输入框时不触发，避免输入空格等按键时误操作"""
+        def handler(event):
+            if isinstance(self.focus_get(), (Entry, Text)):
+                return
+            command()
+        return handler
 
     def _bind_mouse_events(self):
         """绑定鼠标事件"""
@@ -1569,51 +2219,90 @@ class PillDetectorApp(ctk.CTk):
                 continue
         return available
 
-    def _load_models_config(self):
+    def _load_cameras_cache(self):
+        """读取缓存的摄像头列表，并记录缓存是否仍在有效期内"""
+        self._cameras_cache_fresh = False
+        try:
+            if self.cameras_config_path.exists():
+                with open(self.cameras_config_path, 'r', encoding='utf-8') as f:
+                    cache = json.load(f)
+                age = time.time() - cache.get("timestamp", 0)
+                self._cameras_cache_fresh = 0 <= age < self.CAMERA_CACHE_SECONDS
+                return cache.get("cameras", [])
+        except Exception as e:
+            logger.error(f"加载摄像头缓存失败: {e}")
+        return []
+
+    def _probe_cameras_bg(self):
+        """后台探测摄像头，写入缓存后交给界面线程更新列表"""
+        cameras = self._detect_cameras()
+        try:
+            _atomic_write_json(self.cameras_config_path, {"cameras": cameras, "timestamp": time.time()})
+        except Exception as e:
+            logger.error(f"保存摄像头缓存失败: {e}")
+
+        try:
+            self.after(0, self._apply_camera_list, cameras)
+        except RuntimeError:
+            pass  # 探测完成前窗口已关闭
+
+    def _apply_camera_list(self, cameras):
+        """用探测结果更新摄像头下拉框，尽量保留当前选择"""
+        if cameras == self.available_cameras:
+            return
+
+        self.available_cameras = cameras
+        cam_options = [f"摄像头 {i}" for i in cameras] if cameras else ["无可用摄像头"]
+        current = self.cam_combo.get()
+        self.cam_combo.configure(values=cam_options)
+        self.cam_combo.set(current if current in cam_options else cam_options[0])
+        logger.info(f"摄像头列表已更新: {cameras}")
+
+    def _load_models_config(self, future):
         """加载模型配置"""
         try:
-            if self.models_config_path.exists():
-                with open(self.models_config_path, 'r', encoding='utf-8') as f:
-                    self.models = json.load(f)
+            config = future.result()
+            if config is not None:
+                self.models = config
                 logger.info(f"已加载 {len(self.models)} 个模型配置")
         except Exception as e:
             logger.error(f"加载模型配置失败: {e}")
 
-    def _load_watermark_config(self):
+    def _load_watermark_config(self, future):
         """加载水印配置"""
         try:
-            if self.watermark_config_path.exists():
-                with open(self.watermark_config_path, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-                    self.watermark.custom_text = config.get('custom_text', '药片检测系统')
-                    self.watermark.set_position(
-                        config.get('position_x', 0.02),
-                        config.get('position_y', 0.02)
-                    )
-                    if hasattr(self, 'watermark_text_var'):
-                        self.watermark_text_var.set(self.watermark.custom_text)
+            config = future.result()
+            if config is not None:
+                self.watermark.custom_text = config.get('custom_text', '药片检测系统')
+                self.watermark.set_position(
+                    config.get('position_x', 0.02),
+                    config.get('position_y', 0.02)
+                )
+                if hasattr(self, 'watermark_text_var'):
+                    self.watermark_text_var.set(self.watermark.custom_text)
                 logger.info("已加载水印配置")
         except Exception as e:
             logger.error(f"加载水印配置失败: {e}")
 
-    def _load_target_config(self):
+    def _load_target_config(self, future):
         """加载目标片数配置"""
         try:
-            if self.target_config_path.exists():
-                with open(self.target_config_path, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-                    target_value = config.get('target_pills', 0)
-                    if target_value == "":
-                        target_value = 0
-                    self.target_pills_var.set(int(target_value))
-                    self.watermark.set_target_pills(int(target_value))
-
-                    # 更新状态显示
-                    if int(target_value) > 0:
-                        self.target_status_label.configure(
-                            text=f"目标片数: {int(target_value)}",
-                            text_color="orange"
-                        )
+            config = future.result()
+            if config is not None:
+                target_value = config.get('target_pills', 0)
+                if target_value == "":
+                    target_value = 0
+                self.target_pills_var.set(int(target_value))
+                self.watermark.set_target_pills(int(target_value))
+                self.target_entry.delete(0, "end")
+                self.target_entry.insert(0, str(int(target_value)))
+
+                # 更新状态显示
+                if int(target_value) > 0:
+                    self.target_status_label.configure(
+                        text=f"目标片数: {int(target_value)}",
+                        text_color="orange"
+                    )
                 logger.info("已加载目标片数配置")
         except Exception as e:
             logger.error(f"加载目标片数配置失败: {e}")
@@ -1621,52 +2310,66 @@ class PillDetectorApp(ctk.CTk):
     def _validate_target_entry(self):
         """验证目标片数输入"""
         try:
-            value = self.target_entry.get()
-            if value.strip() == "":
-                self.target_pills_var.set(0)
+            if self.target_entry.get().strip() == "":
+                self.target_entry.insert(0, "0")
         except:
             pass
 
-    def _save_models_config(self):
-        """保存模型配置"""
-        try:
-            with open(self.models_config_path, 'w', encoding='utf-8') as f:
-                json.dump(self.models, f, indent=4, ensure_ascii=False)
-            logger.info("模型配置已保存")
-        except Exception as e:
-            logger.error(f"保存模型配置失败: {e}")
+    # 配置名称 -> 日志中的显示名
+    CONFIG_LABELS = {"models": "模型配置", "watermark": "水印配置", "target": "目标片数配置"}
 
-    def _save_watermark_config(self):
-        """保存水印配置"""
-        try:
-            config = {
+    def _config_snapshot(self, name):
+        """在主线程中取出配置内容（可能读取Tk变量），返回 (文件路径, 数据)"""
+        if name == "models":
+            return self.models_config_path, dict(self.models)
+        if name == "watermark":
+            return self.watermark_config_path, {
                 'custom_text': self.watermark.custom_text,
                 'position_x': self.watermark.position_x,
                 'position_y': self.watermark.position_y
             }
-            with open(self.watermark_config_path, 'w', encoding='utf-8') as f:
-                json.dump(config, f, indent=4, ensure_ascii=False)
-            logger.info("水印配置已保存")
-        except Exception as e:
-            logger.error(f"保存水印配置失败: {e}")
+        return self.target_config_path, {
+            'target_pills': self.target_pills_var.get()
+        }
 
-    def _save_target_config(self):
-        """保存目标片数配置"""
+    def _write_config(self, name, path, data):
+        """写入一份配置文件（在写盘线程中执行，不访问Tk）"""
+        label = self.CONFIG_LABELS[name]
         try:
-            config = {
-                'target_pills': self.target_pills_var.get()
-            }
-            with open(self.target_config_path, 'w', encoding='utf-8') as f:
-                json.dump(config, f, indent=4, ensure_ascii=False)
-            logger.info("目标片数配置已保存")
+            _atomic_write_json(path, data)
+            logger.info(f"{label}已保存")
         except Exception as e:
-            logger.error(f"保存目标片数配置失败: {e}")
+            logger.error(f"保存{label}失败: {e}")
+
+    def _mark_dirty(self, name):
+        """标记配置已修改，延迟合并写盘"""
+        self._dirty[name] = True
+        if self._flush_handle:
+            self.after_cancel(self._flush_handle)
+        self._flush_handle = self.after(500, self._flush_configs)
+
+    def _flush_configs(self, wait=False):
+        """将已标记修改的配置交给写盘线程统一写入，wait为True时等待写完"""
+        if self._flush_handle:
+            self.after_cancel(self._flush_handle)
+            self._flush_handle = None
+
+        futures = []
+        for name, dirty in self._dirty.items():
+            if dirty:
+                self._dirty[name] = False
+                path, data = self._config_snapshot(name)
+                # 单线程执行器保证同一文件的写入按提交顺序完成
+                futures.append(self._config_writer.submit(self._write_config, name, path, data))
+        if wait:
+            for future in futures:
+                future.result()
 
     def _save_all_configs(self):
         """保存所有配置"""
-        self._save_models_config()
-        self._save_watermark_config()
-        self._save_target_config()
+        for name in self._dirty:
+            self._dirty[name] = True
+        self._flush_configs(wait=True)
         messagebox.showinfo("成功", "所有配置已保存")
         logger.info("所有配置已保存")
 
@@ -1675,21 +2378,45 @@ class PillDetectorApp(ctk.CTk):
         try:
             self._update_models_list()
 
-            # 如果有模型，自动选择第一个
+            # 如果有模型，自动加载第一个（模型页尚未构建时只推迟列表中的选中高亮）
             if self.models:
-                self.models_listbox.select_set(0)
-                self.models_listbox.event_generate("<<ListboxSelect>>")
-                self.status_label.configure(text=f"已加载 {len(self.models)} 个模型，选中第一个模型")
+                if self._tabs_built["models"]:
+                    self.models_listbox.select_set(0)
+                else:
+                    self._pending_model_select = True
                 logger.info(f"自动加载了 {len(self.models)} 个模型")
 
+                model_name, model_path = next(iter(self.models.items()))
+                self._set_model_loading(True)
+                self.status_label.configure(text=f"已加载 {len(self.models)} 个模型，正在加载: {model_name}")
+                threading.Thread(
+                    target=self._load_model_worker,
+                    args=(model_name, model_path, True),
+                    daemon=True
+                ).start()
+
         except Exception as e:
             logger.error(f"自动加载模型列表失败: {e}")
 
     def _update_models_list(self):
         """更新模型列表"""
-        self.models_listbox.delete(0, "end")
-        for name in self.models.keys():
-            self.models_listbox.insert("end", name)
+        # 模型页尚未构建时跳过，构建时会统一填充
+        if not self._tabs_built["models"]:
+            return
+        names = list(self.models.keys())
+        if names == self._listbox_snapshot:
+            return
+
+        # 只对差异部分增删，倒序应用以保持前面的索引不变
+        matcher = difflib.SequenceMatcher(None, self._listbox_snapshot, names)
+        for tag, i1, i2, j1, j2 in reversed(matcher.get_opcodes()):
+            if tag == "equal":
+                continue
+            if i2 > i1:
+                self.models_listbox.delete(i1, i2 - 1)
+            if j2 > j1:
+                self.models_listbox.insert(i1, *names[j1:j2])
+        self._listbox_snapshot = names
 
     def _import_encrypted_model(self):
         """导入加密模型"""
@@ -1711,7 +2438,7 @@ class PillDetectorApp(ctk.CTk):
 
         self.models[model_name] = file_path
         self._update_models_list()
-        self._save_models_config()
+        self._mark_dirty("models")
 
         self.status_label.configure(text=f"加密模型已导入: {model_name}")
         messagebox.showinfo("成功", f"加密模型「{model_name}」已导入")
@@ -1736,11 +2463,78 @@ class PillDetectorApp(ctk.CTk):
 
         self.models[model_name] = file_path
         self._update_models_list()
-        self._save_models_config()
+        self._mark_dirty("models")
 
         self.status_label.configure(text=f"普通模型已导入: {model_name}")
         messagebox.showinfo("成功", f"普通模型「{model_name}」已导入")
 
+        # 加速模型的导出依赖齐全时才询问；导出耗时数分钟且与检测争用GPU，由用户决定
+        try:
+            fmt = _accel_export_format()
+        except Exception as e:
+            logger.error(f"检测加速导出环境失败: {e}")
+            fmt = None
+        if fmt is None:
+            return
+        fmt_text = "TensorRT FP16引擎" if fmt == "engine" else "ONNX模型"
+        if messagebox.askyesno("加速模型", f"是否在后台为「{model_name}」导出{fmt_text}？\n导出需要数分钟，期间检测可能变慢。"):
+            threading.Thread(target=self._build_engine, args=(model_name, file_path, fmt), daemon=True).start()
+
+    def _engine_stem(self, model_path):
+        """普通模型在engines目录中对应的文件名（不含后缀）；路径本身已在该目录时直接取其文件名"""
+        path = Path(model_path)
+        if path.parent == self.config_dir / "engines":
+            return path.stem
+        digest = hashlib.md5(str(path.resolve()).encode("utf-8")).hexdigest()[:12]
+        return f"{path.stem}_{digest}"
+
+    def _remove_engine_files(self, model_path):
+        """删除为普通模型生成的加速文件（复制的.pt与导出结果），仍被其他模型引用时保留"""
+        engines_dir = self.config_dir / "engines"
+        if not engines_dir.is_dir():
+            return
+        stem = self._engine_stem(model_path)
+        if any(self._engine_stem(p) == stem for p in self.models.values()):
+            return
+        try:
+            for entry in engines_dir.iterdir():
+                if entry.stem == stem and entry.is_file():
+                    entry.unlink()
+                    logger.info(f"已删除加速模型文件: {entry}")
+        except Exception as e:
+            logger.error(f"删除加速模型文件失败: {e}")
+
+    def _build_engine(self, model_name, pt_path, fmt):
+        """后台线程：将PyTorch模型导出为FP16 TensorRT引擎（fmt为engine）或ONNX模型"""
+        try:
+            engines_dir = self.config_dir / "engines"
+            engines_dir.mkdir(exist_ok=True)
+
+            # 复制到配置目录再导出，导出文件与源文件同目录，避免写入只读的源目录
+            work_pt = engines_dir / f"{self._engine_stem(pt_path)}.pt"
+            shutil.copyfile(pt_path, work_pt)
+
+            model = YOLO(str(work_pt), task="detect")
+            if fmt == "engine":
+                exported = model.export(format="engine", half=True, imgsz=self.INFER_SIZE, device=0, workspace=2)
+            else:
+                exported = model.export(format="onnx", imgsz=self.INFER_SIZE, dynamic=False)
+            logger.info(f"加速模型已导出: {exported}")
+        except Exception as e:
+            logger.error(f"导出加速模型失败: {e}")
+            return
+        self.after(0, self._on_engine_built, model_name, pt_path, str(exported))
+
+    def _on_engine_built(self, model_name, pt_path, exported_path):
+        """加速模型导出完成（主线程）：模型仍指向原文件时改用导出结果"""
+        if self.models.get(model_name) != pt_path:
+            # 导出期间模型已被删除或替换，导出结果无人使用
+            self._remove_engine_files(exported_path)
+            return
+        self.models[model_name] = exported_path
+        self._mark_dirty("models")
+        self.status_label.configure(text=f"已为「{model_name}」生成加速模型")
+
     def _on_model_select(self, event):
         """模型选择事件"""
         selection = self.models_listbox.curselection()
@@ -1758,31 +2552,154 @@ class PillDetectorApp(ctk.CTk):
         model_name = self.models_listbox.get(selection[0])
         model_path = self.models[model_name]
 
+        # 解密、加载与预热耗时较长，放到后台线程，避免界面卡住
+        self._set_model_loading(True)
+        self.status_label.configure(text=f"模型加载中: {model_name}")
+        threading.Thread(
+            target=self._load_model_worker,
+            args=(model_name, model_path),
+            daemon=True
+        ).start()
+
+    def _set_model_loading(self, loading):
+        """切换模型加载状态：禁用模型操作按钮并显示进度条"""
+        self._model_loading = loading
+        if not self._tabs_built["models"]:
+            return  # 模型页尚未构建，构建时再按当前状态设置
+        state = "disabled" if loading else "normal"
+        for btn in self.model_buttons:
+            btn.configure(state=state)
+        if loading:
+            self.model_progress.pack(fill="x", padx=10, pady=(0, 20))
+            self.model_progress.start()
+        else:
+            self.model_progress.stop()
+            self.model_progress.pack_forget()
+
+    def _load_model_worker(self, model_name, model_path, quiet=False):
+        """后台线程：解密并加载模型，完成后回到主线程更新界面；quiet为True时不弹窗（启动时自动加载）"""
         try:
             # 如果是加密模型（.rp后缀），先解密
             if model_path.endswith('.rp'):
-                temp_path = self.temp_models_dir / f"{model_name}_temp.pt"
-                if not RPModelHandler.decrypt_model(model_path, str(temp_path)):
-                    messagebox.showerror("错误", "模型解密失败")
-                    return
-                model_path = str(temp_path)
+                model_path = str(self._get_decrypted_model(model_path))
 
-            # 加载模型
-            self.current_model = YOLO(model_path)
-            self.current_model_name = model_name
-            self.current_model_label.configure(text=model_name)
+            # 加载模型并预热，避免首帧推理卡顿
+            model = YOLO(model_path, task="detect")
+            self._warmup_model(model)
+        except Exception as e:
+            self.after(0, self._on_model_load_error, e, quiet)
+            return
+        self.after(0, self._on_model_loaded, model_name, model, quiet)
+
+    def _get_decrypted_model(self, model_path):
+        """返回解密后的临时模型文件；源文件未变化时直接复用上次的解密结果"""
+        st = os.stat(model_path)
+        key = f"{Path(model_path).stem}_{st.st_mtime_ns}_{st.st_size}"
+        for suffix in ('.engine', '.pt'):
+            cached = self.temp_models_dir / f"{key}{suffix}"
+            if cached.exists():
+                os.utime(cached)  # 刷新使用时间，供缓存淘汰参考
+                logger.info(f"复用已解密模型: {cached.name}")
+                return cached
+
+        temp_path = self.temp_models_dir / f"{key}.pt"
+        if not RPModelHandler.decrypt_model(model_path, str(temp_path)):
+            raise RuntimeError("模型解密失败")
+        # PyTorch权重为zip格式；否则是训练端导出的TensorRT引擎，ultralytics按后缀选择后端
+        with open(temp_path, 'rb') as f:
+            is_engine = f.read(2) != b"PK"
+        if is_engine:
+            engine_path = temp_path.with_suffix('.engine')
+            os.replace(temp_path, engine_path)
+            temp_path = engine_path
+
+        self._prune_decrypted_models(keep=temp_path)
+        return temp_path
+
+    def _prune_decrypted_models(self, keep):
+        """只保留最近使用的若干个解密模型，其余删除"""
+        try:
+            files = [f for f in self.temp_models_dir.glob("*")
+                     if f.is_file() and f.suffix in ('.pt', '.engine') and f != keep]
+            files.sort(key=lambda f: f.stat().st_mtime, reverse=True)
+            for old in files[self.DECRYPT_CACHE_LIMIT - 1:]:
+                old.unlink()
+                logger.info(f"已删除过期的解密模型: {old.name}")
+        except Exception as e:
+            logger.error(f"清理解密模型缓存失败: {e}")
+
+    def _on_model_loaded(self, model_name, model, quiet=False):
+        """模型加载完成（主线程）"""
+        self._set_model_loading(False)
+        self.current_model = model
+        self.last_detections = None  # 旧模型的检测结果作废
+        self._last_frame_key = None
+        self.current_model_name = model_name
+        self.current_model_label.configure(text=model_name)
+
+        # 启用检测相关按钮
+        self.cam_btn.configure(state="normal")
+        self.detect_btn.configure(state="normal")
+        self.capture_btn.configure(state="normal")
+
+        self.status_label.configure(text=f"模型已加载: {model_name}")
+        if not quiet:
+            messagebox.showinfo("成功", f"模型「{model_name}」已加载")
 
-            # 启用检测相关按钮
-            self.cam_btn.configure(state="normal")
-            self.detect_btn.configure(state="normal")
-            self.capture_btn.configure(state="normal")
+    def _on_model_load_error(self, error, quiet=False):
+        """模型加载失败（主线程）"""
+        self._set_model_loading(False)
+        logger.error(f"加载模型失败: {error}")
+        self.status_label.configure(text="模型加载失败")
+        if not quiet:
+            messagebox.showerror("错误", f"加载模型失败: {error}")
 
-            self.status_label.configure(text=f"模型已加载: {model_name}")
-            messagebox.showinfo("成功", f"模型「{model_name}」已加载")
+    def _warmup_model(self, model, runs=3):
+        """用与摄像头同尺寸的空白帧做几次推理，提前完成cuDNN算法选择与内核初始化"""
+        try:
+            import torch
+            torch.backends.cudnn.benchmark = True  # 摄像头分辨率固定，缓存最快卷积算法
 
+            dummy = np.zeros((600, 800, 3), dtype=np.uint8)
+            with torch.inference_mode():
+                for _ in range(runs):
+                    self._run_inference(model, dummy, 0.25)
         except Exception as e:
-            logger.error(f"加载模型失败: {e}")
-            messagebox.showerror("错误", f"加载模型失败: {e}")
+            logger.error(f"模型预热失败: {e}")
+
+    def _run_inference(self, model, frame, conf):
+        """执行检测，返回原帧坐标系下的检测框(int, N×4)与置信度(N)
+
+        直接传入BGR帧：ultralytics对numpy输入的letterbox预处理与自行预处理的张量耗时相当，
+        而张量输入在后处理时还要把整幅输入转回numpy（GPU上还需同步并回传主机）
+        """
+        with self._inference_lock:
+            results = model(frame, conf=conf, imgsz=self.INFER_SIZE, verbose=False)
+        if not results or len(results[0].boxes) == 0:
+            return np.empty((0, 4), dtype=np.int32), np.empty(0, dtype=np.float32)
+
+        boxes = results[0].boxes
+        return boxes.xyxy.cpu().numpy().astype(np.int32), boxes.conf.cpu().numpy()
+
+    def _detect_frame(self, frame):
+        """推理线程回调：检测开启时返回检测结果，否则返回None
+
+        画面与上一帧完全相同（32×32灰度缩略图的CRC32一致）且模型、阈值未变时直接复用上次结果
+        """
+        model = self.current_model
+        if not self.detecting or model is None:
+            return None
+
+        small = cv2.resize(frame, (32, 32), interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(small, cv2.COLOR_BGR2GRAY, dst=self._hash_gray)
+        key = (zlib.crc32(self._hash_gray), id(model), self.conf_threshold)
+        if key == self._last_frame_key:
+            return self._last_frame_detections
+
+        detections = self._run_inference(model, frame, self.conf_threshold)
+        self._last_frame_key = key
+        self._last_frame_detections = detections
+        return detections
 
     def _rename_model(self):
         """重命名模型"""
@@ -1801,7 +2718,7 @@ class PillDetectorApp(ctk.CTk):
 
             self.models[new_name] = self.models.pop(old_name)
             self._update_models_list()
-            self._save_models_config()
+            self._mark_dirty("models")
 
             if self.current_model_name == old_name:
                 self.current_model_name = new_name
@@ -1821,9 +2738,10 @@ class PillDetectorApp(ctk.CTk):
         if not messagebox.askyesno("确认", f"确定删除「{model_name}」吗？"):
             return
 
-        del self.models[model_name]
+        model_path = self.models.pop(model_name)
+        self._remove_engine_files(model_path)
         self._update_models_list()
-        self._save_models_config()
+        self._mark_dirty("models")
 
         if self.current_model_name == model_name:
             self.current_model = None
@@ -1839,10 +2757,12 @@ class PillDetectorApp(ctk.CTk):
         """清理临时文件"""
         try:
             count = 0
-            for file in self.temp_models_dir.glob("*"):
-                if file.is_file():
-                    file.unlink()
-                    count += 1
+            # scandir的目录项自带文件类型，无需逐个再stat
+            with os.scandir(self.temp_models_dir) as entries:
+                for entry in entries:
+                    if entry.is_file(follow_symlinks=False):
+                        os.unlink(entry.path)
+                        count += 1
 
             messagebox.showinfo("成功", f"已清理 {count} 个临时文件")
             logger.info(f"已清理 {count} 个临时文件")
@@ -1861,41 +2781,38 @@ class PillDetectorApp(ctk.CTk):
     def _on_watermark_dialog_close(self):
         """水印对话框关闭事件"""
         self.watermark_dialog = None
-        self._save_watermark_config()
+        self._mark_dirty("watermark")
 
     def _set_target_pills(self):
         """设置目标片数"""
-        try:
-            target_str = self.target_entry.get().strip()
-            if target_str == "":
-                target = 0
-            else:
-                target = int(target_str)
-
-            if target < 0:
-                messagebox.showwarning("警告", "目标片数不能为负数")
-                return
+        target_str = self.target_entry.get().strip()
+        target = 0 if target_str == "" else _parse_number(target_str, int)
+        if target is None:
+            messagebox.showerror("错误", "请输入有效的数字")
+            return
 
-            self.watermark.set_target_pills(target)
-            self._save_target_config()
+        if target < 0:
+            messagebox.showwarning("警告", "目标片数不能为负数")
+            return
 
-            if target > 0:
-                self.target_status_label.configure(
-                    text=f"目标片数: {target}",
-                    text_color="orange"
-                )
-                self.status_label.configure(text=f"已设置目标片数: {target}")
-                logger.info(f"设置目标片数: {target}")
-            else:
-                self.target_status_label.configure(
-                    text="目标片数: 未设置",
-                    text_color="gray"
-                )
-                self.status_label.configure(text="已禁用目标片数检测")
-                logger.info("禁用目标片数检测")
+        self.target_pills_var.set(target)
+        self.watermark.set_target_pills(target)
+        self._mark_dirty("target")
 
-        except ValueError:
-            messagebox.showerror("错误", "请输入有效的数字")
+        if target > 0:
+            self.target_status_label.configure(
+                text=f"目标片数: {target}",
+                text_color="orange"
+            )
+            self.status_label.configure(text=f"已设置目标片数: {target}")
+            logger.info(f"设置目标片数: {target}")
+        else:
+            self.target_status_label.configure(
+                text="目标片数: 未设置",
+                text_color="gray"
+            )
+            self.status_label.configure(text="已禁用目标片数检测")
+            logger.info("禁用目标片数检测")
 
     def _trigger_success_notification(self):
         """触发成功通知"""
@@ -1907,7 +2824,7 @@ class PillDetectorApp(ctk.CTk):
             current_time_str = datetime.now().strftime("%H:%M:%S")
 
             # 语音播报 - 使用队列机制，可以连续播报
-            success_message = f"{self.watermark.custom_text}{self.target_pills_var.get()}片发药成功"
+            success_message = f"{self.watermark.custom_text}{self.watermark.target_pills}片发药成功"
             logger.info(f"准备播报成功消息: {success_message}")
 
             # 语音播报
@@ -1926,10 +2843,12 @@ class PillDetectorApp(ctk.CTk):
 
     def _toggle_camera(self):
         """打开/关闭摄像头"""
-        if self.camera_thread and self.camera_thread.is_alive():
-            # 关闭摄像头
-            self.camera_thread.stop()
-            self.camera_thread = None
+        if self.inference_thread is not None and self.inference_thread.is_alive():
+            # 关闭摄像头（采集线程先暂停，短时间内再次打开同一摄像头时直接恢复，空闲稍久后自行释放设备）
+            self.inference_thread.stop()
+            self.inference_thread = None
+            if self.camera_thread:
+                self.camera_thread.pause()
             self.cam_btn.configure(text="打开摄像头")
             self.detect_btn.configure(state="disabled", text="▶️ 开始检测")
             self.record_btn.configure(state="disabled", text="⏺️ 开始录像")
@@ -1947,8 +2866,10 @@ class PillDetectorApp(ctk.CTk):
                 self.video_writer.release()
                 self.video_writer = None
 
-            # 清空画布
-            self.video_canvas.delete("all")
+            # 清空画布（隐藏画面图元，保留PhotoImage供下次打开摄像头复用）
+            if self._video_item is not None:
+                self.video_canvas.itemconfigure(self._video_item, state="hidden")
+                self._video_hidden = True
             self.count_label.configure(text="0")
 
             # 重置水印统计
@@ -1957,6 +2878,7 @@ class PillDetectorApp(ctk.CTk):
             # 重置帧计数器
             self.frame_counter = 0
             self.last_frame_count = 0
+            self.last_fps_time = time.perf_counter()
 
             self.status_label.configure(text="摄像头已关闭")
             logger.info("摄像头已关闭")
@@ -1972,8 +2894,20 @@ class PillDetectorApp(ctk.CTk):
             except:
                 cam_idx = 0
 
-            self.camera_thread = CameraThread(cam_idx, 800, 600)
-            self.camera_thread.start()
+            if (self.camera_thread and self.camera_thread.is_alive()
+                    and self.camera_thread.camera_index == cam_idx
+                    and self.camera_thread.resume()):
+                pass
+            else:
+                # 首次打开、更换了摄像头或设备已空闲释放：停止旧线程并重新打开设备
+                if self.camera_thread:
+                    self.camera_thread.stop()
+                    self.camera_thread.join(timeout=1.0)  # 等旧线程释放设备后再打开
+                self.camera_thread = CameraThread(cam_idx, 800, 600)
+                self.camera_thread.start()
+            self.inference_thread = InferenceThread(
+                self.camera_thread, self._detect_frame, self._notify_new_frame)
+            self.inference_thread.start()
 
             self.cam_btn.configure(text="关闭摄像头")
             self.detect_btn.configure(state="normal")
@@ -1987,16 +2921,16 @@ class PillDetectorApp(ctk.CTk):
             # 重置帧计数器
             self.frame_counter = 0
             self.last_frame_count = 0
+            self.last_fps_time = time.perf_counter()
 
             # 创建预览窗口
             if not self.preview_window:
                 self.preview_window = DraggablePreview(self, 250, 200)
                 self.preview_window.hide()
+            self.camera_thread.preview_size = self.preview_window.preview_size
 
             self.status_label.configure(text="摄像头已打开")
 
-            # 启动视频更新
-            self.after(100, self._update_video)
             logger.info(f"摄像头 {cam_idx} 已打开")
 
     def _toggle_preview_window(self):
@@ -2009,83 +2943,98 @@ class PillDetectorApp(ctk.CTk):
                 self.preview_window.hide()
                 self.preview_toggle_btn.configure(text="📷 显示预览")
 
-    def _update_video(self):
-        """更新视频画面"""
-        if self.camera_thread and self.camera_thread.is_alive():
-            frame = self.camera_thread.get_frame()
-            if frame is not None:
+    def _notify_new_frame(self):
+        """推理线程回调：向界面线程投递新帧事件"""
+        self.event_generate("<<NewFrame>>", when="tail")
+
+    def _update_video(self, event=None):
+        """更新视频画面（由推理线程的<<NewFrame>>事件驱动）"""
+        if self.inference_thread and self.camera_thread and self.camera_thread.is_alive():
+            # 检测已在推理线程中完成，这里只负责绘制
+            result = self.inference_thread.get_result()
+            if result is not None:
+                frame, preview, detections = result
+                start = time.perf_counter()
                 try:
-                    self.current_frame = frame.copy()
+                    # 保存不含检测框的原始帧供截图使用，复用同一块缓冲区
+                    if self._frame_buf is None or self._frame_buf.shape != frame.shape:
+                        self._frame_buf = np.empty_like(frame)
+                    np.copyto(self._frame_buf, frame)
+                    self.current_frame = self._frame_buf
+                    self.last_detections = detections
                     self.frame_counter += 1
 
                     # 更新预览窗口
                     if self.preview_window:
-                        self.preview_window.update_preview(frame)
+                        self.preview_window.update_preview(preview if preview is not None else frame)
 
-                    # 执行检测
+                    # 绘制检测结果
                     pill_count = 0
-                    if self.detecting and self.current_model:
-                        results = self.current_model(frame, conf=self.conf_var.get())
-                        if results and len(results) > 0:
-                            boxes = results[0].boxes
-                            pill_count = len(boxes)
-
-                            # 控制检测日志输出频率（每10秒输出一次）
-                            current_time = time.time()
-                            if current_time - self.last_detection_log_time > 10:
-                                logger.info(f"检测到 {pill_count} 片药片 (置信度阈值: {self.conf_var.get():.2f})")
-                                self.last_detection_log_time = current_time
-
-                            # 更新水印统计 - 检查是否达到目标片数（严格等于）
-                            target_reached = self.watermark.update_stats(pill_count)
-                            if target_reached:
-                                # 触发成功通知
-                                self._trigger_success_notification()
-
-                            # 绘制检测框
-                            for box in boxes:
-                                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                                conf = box.conf[0]
-                                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                                cv2.putText(frame, f"{conf:.2f}", (x1, y1 - 10),
-                                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+                    if detections is not None:
+                        xyxy, confs = detections
+                        pill_count = len(xyxy)
+
+                        # 控制检测日志输出频率（按帧计数采样，每128帧输出一次，无需每帧读取时钟）
+                        if (self.frame_counter & 127) == 0 and logger.isEnabledFor(logging.INFO):
+                            logger.info(f"检测到 {pill_count} 片药片 (置信度阈值: {self.conf_threshold:.2f})")
+
+                        # 更新水印统计 - 检查是否达到目标片数（严格等于）
+                        target_reached = self.watermark.update_stats(pill_count)
+                        if target_reached:
+                            # 触发成功通知
+                            self._trigger_success_notification()
+
+                        # 绘制检测框
+                        _draw_detections(frame, xyxy, confs)
                     else:
                         # 如果没有检测，也要更新水印的当前片数为0
                         self.watermark.update_stats(0)
 
-                        # 控制帧率日志输出（每30秒输出一次）
-                        current_time = time.time()
-                        if current_time - self.last_detection_log_time > 30:
-                            fps = (self.frame_counter - self.last_frame_count) / 30
-                            logger.info(f"摄像头运行中，当前帧率: {fps:.1f} FPS")
+                        # 控制帧率日志输出（每512帧统计一次，仅在采样时读取时钟）
+                        if (self.frame_counter & 511) == 0:
+                            current_time = time.perf_counter()
+                            fps = (self.frame_counter - self.last_frame_count) / (current_time - self.last_fps_time)
+                            if logger.isEnabledFor(logging.INFO):
+                                logger.info(f"摄像头运行中，当前帧率: {fps:.1f} FPS")
                             self.last_frame_count = self.frame_counter
-                            self.last_detection_log_time = current_time
+                            self.last_fps_time = current_time
 
                     # 更新计数标签
                     self.count_label.configure(text=str(pill_count))
 
-                    # 显示水印
+                    # 显示水印（推理线程交来的帧归界面线程独占，直接在其上绘制）
                     show_drag_rect = self.watermark_drag_enabled
-                    watermarked_frame = self.watermark.add_watermark(frame.copy(), show_drag_rect)
+                    watermarked_frame = self.watermark.add_watermark(frame, show_drag_rect)
 
-                    # 如果是录制中，使用带水印的帧
+                    # 如果是录制中，使用带水印的帧（交给录像线程编码，该帧之后只读）
                     if self.recording and self.video_writer:
                         self.video_writer.write(watermarked_frame)
 
                     # 显示到画布
                     frame_to_show = watermarked_frame
 
-                    # 调整大小并显示
-                    frame_rgb = cv2.cvtColor(frame_to_show, cv2.COLOR_BGR2RGB)
-                    frame_resized = cv2.resize(frame_rgb, (800, 600))
+                    # 调整大小并显示（尺寸已符合时跳过缩放）
+                    if frame_to_show.shape[1::-1] != (800, 600):
+                        frame_to_show = cv2.resize(frame_to_show, (800, 600), dst=self._display_buf)
 
-                    pil_img = Image.fromarray(frame_resized)
-                    from PIL import ImageTk
-                    video_photo = ImageTk.PhotoImage(image=pil_img)
+                    # 由Pillow在解包时完成BGR→RGB，省去整帧cvtColor
+                    pil_img = Image.frombuffer("RGB", (800, 600), frame_to_show, "raw", "BGR", 0, 1)
+
+                    # 复用同一个PhotoImage与画布图元，只替换像素，不重建对象
+                    if self._video_item is None:
+                        self._video_photo = ImageTk.PhotoImage(image=pil_img)
+                        self._video_item = self.video_canvas.create_image(
+                            0, 0, image=self._video_photo, anchor="nw")
+                    else:
+                        self._video_photo.paste(pil_img)
+                        if self._video_hidden:
+                            self.video_canvas.itemconfigure(self._video_item, state="normal")
+                            self._video_hidden = False
 
-                    self.video_canvas.delete("all")
-                    self.video_canvas.create_image(0, 0, image=video_photo, anchor="nw")
-                    self.video_canvas.photo = video_photo
+                    # 记录绘制耗时，每512帧输出一次各阶段统计
+                    self._render_ms.append((time.perf_counter() - start) * 1000)
+                    if (self.frame_counter & 511) == 0 and logger.isEnabledFor(logging.INFO):
+                        self._log_pipeline_stats()
 
                 except Exception as e:
                     current_time = time.time()
@@ -2093,8 +3042,14 @@ class PillDetectorApp(ctk.CTk):
                         logger.error(f"更新视频错误: {e}")
                         self.last_detection_log_time = current_time
 
-            # 继续更新
-            self.after(50, self._update_video)
+    def _log_pipeline_stats(self):
+        """输出流水线各阶段耗时分位数与丢帧计数，用于定位瓶颈"""
+        infer_p50, infer_p95 = _percentiles(self.inference_thread.infer_ms)
+        render_p50, render_p95 = _percentiles(self._render_ms)
+        rec_drops = self.video_writer.dropped if self.video_writer else 0
+        logger.info(f"流水线统计: 推理 p50={infer_p50:.1f}ms p95={infer_p95:.1f}ms, "
+                    f"绘制 p50={render_p50:.1f}ms p95={render_p95:.1f}ms, "
+                    f"界面丢弃结果={self.inference_thread.dropped}, 录像丢帧={rec_drops}")
 
     def _toggle_detection(self):
         """开始/停止检测"""
@@ -2105,20 +3060,25 @@ class PillDetectorApp(ctk.CTk):
             logger.info("检测已开始")
         else:
             self.detecting = False
+            self.last_detections = None
             self.detect_btn.configure(text="▶️ 开始检测")
             self.status_label.configure(text="检测已停止")
             logger.info("检测已停止")
 
     def _update_conf_label(self, value):
-        """更新置信度标签"""
-        self.conf_label.configure(text=f"{value:.2f}")
+        """更新置信度标签（显示两位小数，文本不变时不刷新控件）"""
+        self.conf_threshold = value
+        text = f"{value:.2f}"
+        if text != self._conf_text:
+            self.conf_label.configure(text=text)
+            self._conf_text = text
 
     def _update_watermark_text(self):
         """更新水印文字"""
         text = self.watermark_text_var.get()
         self.watermark.set_custom_text(text)
         self.status_label.configure(text=f"水印文字已更新: {text}")
-        self._save_watermark_config()
+        self._mark_dirty("watermark")
 
     def _toggle_watermark_drag(self):
         """切换水印拖动模式"""
@@ -2138,18 +3098,41 @@ class PillDetectorApp(ctk.CTk):
             self.watermark.start_drag(event.x, event.y, width, height)
 
     def _on_mouse_drag(self, event):
-        """鼠标拖动事件"""
+        """鼠标拖动事件（节流到60Hz，间隔内的事件只保留最后一个）"""
+        now = time.monotonic()
+        if now - self._last_drag_ts < 1 / 60:
+            self._pending_drag_event = event
+            if self._drag_flush_id is None:
+                self._drag_flush_id = self.after(15, self._flush_drag)
+            return
+        self._apply_drag(event)
+
+    def _flush_drag(self):
+        """处理节流期间最新的拖动事件"""
+        self._drag_flush_id = None
+        event = self._pending_drag_event
+        if event is not None:
+            self._apply_drag(event)
+
+    def _apply_drag(self, event):
+        """按拖动事件移动水印"""
+        self._pending_drag_event = None
+        self._last_drag_ts = time.monotonic()
         if self.watermark_drag_enabled and self.current_frame is not None:
             height, width = self.current_frame.shape[:2]
             self.watermark.update_drag(event.x, event.y, width, height)
 
     def _on_mouse_up(self, event):
         """鼠标释放事件"""
+        # 先提交尚未处理的拖动，保证最终位置准确
+        if self._drag_flush_id is not None:
+            self.after_cancel(self._drag_flush_id)
+            self._flush_drag()
         if self.watermark_drag_enabled:
             self.watermark.end_drag()
-            self._save_watermark_config()
+            self._mark_dirty("watermark")
             self.status_label.configure(
-                text=f"水印位置已更新: X={self.watermark.position_x * 100:.1f}%, Y={self.watermark.position_y * 100:.1f}%")
+                text=f"水印位置已更新: X={self.watermark.pos_x_text}%, Y={self.watermark.pos_y_text}%")
 
     def _select_record_dir(self):
         """选择录像目录"""
@@ -2179,7 +3162,7 @@ class PillDetectorApp(ctk.CTk):
 
             try:
                 fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-                self.video_writer = cv2.VideoWriter(
+                self.video_writer = VideoRecorder(
                     str(self.video_save_path),
                     fourcc,
                     20.0,
@@ -2211,17 +3194,13 @@ class PillDetectorApp(ctk.CTk):
             messagebox.showwarning("提示", "没有可用的视频帧")
             return
 
-        # 绘制检测结果
+        # 绘制检测结果（复用该帧在推理线程中的结果，仅在没有缓存时补做一次推理）
         frame = self.current_frame.copy()
         if self.detecting and self.current_model:
-            results = self.current_model(frame, conf=self.conf_var.get())
-            if results and len(results) > 0:
-                for box in results[0].boxes:
-                    x1, y1, x2, y2 = map(int, box.xyxy[0])
-                    conf = box.conf[0]
-                    cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                    cv2.putText(frame, f"{conf:.2f}", (x1, y1 - 10),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+            detections = self.last_detections
+            if detections is None:
+                detections = self._run_inference(self.current_model, frame, self.conf_threshold)
+            _draw_detections(frame, *detections)
 
         # 添加水印
         frame = self.watermark.add_watermark(frame)
@@ -2241,7 +3220,9 @@ class PillDetectorApp(ctk.CTk):
 
     def _on_closing(self):
         """关闭窗口时清理资源"""
-        # 停止摄像头
+        # 停止推理与摄像头
+        if self.inference_thread:
+            self.inference_thread.stop()
         if self.camera_thread:
             self.camera_thread.stop()
 
@@ -2260,8 +3241,9 @@ class PillDetectorApp(ctk.CTk):
         # 清理临时文件
         self._clean_temp_files()
 
-        # 保存所有配置
+        # 保存所有配置（等待写盘完成）
         self._save_all_configs()
+        self._config_writer.shutdown()
 
         # 关闭窗口
         self.destroy()
@@ -2306,6 +3288,15 @@ if __name__ == "__main__":
         print(f"⚠️ 缺少音频依赖: {e}")
         print("音频提示功能可能无法正常工作")
 
+    # Pillow-SIMD（版本号带 .post 后缀）可加速水印绘制与预览缩放
+    import PIL
+
+    if ".post" in PIL.__version__:
+        print(f"✅ 已启用 Pillow-SIMD ({PIL.__version__})")
+    else:
+        print(f"ℹ️ 当前为标准 Pillow ({PIL.__version__})，如CPU支持AVX2可安装 Pillow-SIMD 加速：")
+        print("pip uninstall pillow && pip install pillow-simd")
+
     print("=" * 50)
     print()
 
@@ -9,14 +9,18 @@ from tkinter import filedialog, messagebox, Listbox, Scrollbar, simpledialog, tt
 from datetime import datetime
 from pathlib import Path
 import threading
+import warnings
+import difflib
 import hashlib
-import shutil
+import importlib.util
 import random
 import os
 import sys
 import json
-import glob
-from queue import Queue
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue, Empty
 import logging
 
 # 设置日志
@@ -31,21 +35,38 @@ except ImportError:
     print("请运行: pip install numpy")
     sys.exit(1)
 
-# 尝试导入深度学习库（可选的）
+# 导入Pillow（预览与画布显示需要）
 try:
-    import torch
-    from ultralytics import YOLO
-
-    DL_AVAILABLE = True
+    from PIL import Image, ImageTk
 except ImportError:
-    torch = None
-    YOLO = None
-    DL_AVAILABLE = False
+    print("错误: 需要安装Pillow库")
+    print("请运行: pip install pillow")
+    sys.exit(1)
+
+# 深度学习库（可选的）：启动时只检查是否安装，首次需要时再导入，避免拖慢界面启动
+DL_AVAILABLE = all(importlib.util.find_spec(name) is not None for name in ("torch", "ultralytics"))
+torch = None
+YOLO = None
+if not DL_AVAILABLE:
     logger.warning("深度学习库未安装，训练功能将不可用")
 
-# GPU优化配置（可选）
+# 导出TensorRT引擎所需的可选依赖；缺失时ultralytics会在运行时自动pip安装，因此导出前先检查
+TRT_EXPORT_AVAILABLE = all(importlib.util.find_spec(name) is not None
+                           for name in ("onnx", "onnxslim", "onnxruntime", "tensorrt"))
+
+# GPU优化配置（可选），需在导入torch之前设置
 os.environ["CUDA_MODULE_LOADING"] = "LAZY"
 
+
+def _import_dl():
+    """导入深度学习库并返回CUDA是否可用，首次调用较慢（会加载CUDA运行库）"""
+    global torch, YOLO
+    if YOLO is None:
+        import torch as _torch
+        from ultralytics import YOLO as _YOLO
+        torch, YOLO = _torch, _YOLO
+    return torch.cuda.is_available()
+
 # 预设参数模板
 DEFAULT_TEMPLATES = {
     "通用模板": {
@@ -116,26 +137,78 @@ PREVIEW_WIDTH = 250
 PREVIEW_HEIGHT = 200
 VAL_SPLIT_RATIO = 0.2
 MIN_BOX_SIZE = 10
+IMAGE_EXTENSIONS = ('.jpg', '.png')
+IMAGE_CACHE_BYTES = 256 << 20  # 标注图片缓存上限（缩放后的图像）
+CAPTURE_JPEG_QUALITY = 95  # 拍照保存质量，作为训练数据不宜再降低
+TRAIN_STOP_TIMEOUT = 60  # 关闭窗口后等待训练线程退出的最长秒数（含收尾验证）
+TRAIN_STOP_POLL_MS = 200  # 等待训练线程退出时的轮询间隔
+
+
+def _list_images(img_dir):
+    """单次扫描目录，返回排序后的图片路径列表，目录不存在时返回空列表"""
+    try:
+        with os.scandir(img_dir) as it:
+            images = [entry.path for entry in it
+                      if entry.name.lower().endswith(IMAGE_EXTENSIONS) and entry.is_file()]
+    except FileNotFoundError:
+        return []
+    images.sort()
+    return images
+
+
+def _has_images(img_dir):
+    """目录中是否至少有一张图片，找到第一张即返回"""
+    try:
+        with os.scandir(img_dir) as it:
+            return any(entry.name.lower().endswith(IMAGE_EXTENSIONS) and entry.is_file() for entry in it)
+    except FileNotFoundError:
+        return False
 
 
 class RPModelHandler:
     """RP模型加密解密处理器"""
 
-    HEADER = b"PILL_MODEL_RP_2026"
+    HEADER = b"PILL_MODEL_RP_2027"  # 当前文件头（SHA-256摘要）
+    LEGACY_HEADER = b"PILL_MODEL_RP_2026"  # 旧版文件头（MD5摘要），仅用于解密
+    HASHES = {HEADER: hashlib.sha256, LEGACY_HEADER: hashlib.md5}
     KEY = 0x5A
+    CHUNK_SIZE = 1 << 20  # 分块大小 1 MiB
+
+    @staticmethod
+    def _xor_stream(fin, fout, hasher, hash_output):
+        """分块异或：复用固定缓冲区，边读边计算摘要边写出
+
+        hash_output为True时对异或结果计算摘要（解密），否则对输入计算摘要（加密）
+        """
+        buf = bytearray(RPModelHandler.CHUNK_SIZE)
+        src = np.frombuffer(buf, dtype=np.uint8)
+        dst = np.empty_like(src)
+        key = np.uint8(RPModelHandler.KEY)
+
+        while True:
+            n = fin.readinto(buf)
+            if not n:
+                break
+            np.bitwise_xor(src[:n], key, out=dst[:n])
+            hasher.update(dst[:n] if hash_output else src[:n])
+            fout.write(memoryview(dst[:n]))
 
     @staticmethod
     def encrypt_model(pt_path, rp_path):
         """加密模型文件"""
         try:
-            with open(pt_path, 'rb') as f:
-                model_data = f.read()
-                md5 = hashlib.md5(model_data).digest()
+            hasher = hashlib.sha256()
+            with open(pt_path, 'rb') as fin, open(rp_path, 'wb') as fout:
+                fout.write(RPModelHandler.HEADER)
+                # 先写入摘要占位，数据写完后回填
+                digest_pos = fout.tell()
+                fout.write(bytes(hasher.digest_size))
 
-            encrypted_data = bytes([b ^ RPModelHandler.KEY for b in model_data])
+                # 简单异或加密
+                RPModelHandler._xor_stream(fin, fout, hasher, hash_output=False)
 
-            with open(rp_path, 'wb') as f:
-                f.write(RPModelHandler.HEADER + md5 + encrypted_data)
+                fout.seek(digest_pos)
+                fout.write(hasher.digest())
 
             logger.info(f"模型加密成功: {pt_path} -> {rp_path}")
             return True
@@ -147,45 +220,66 @@ class RPModelHandler:
     @staticmethod
     def decrypt_model(rp_path, pt_path):
         """解密模型文件"""
+        part_path = f"{pt_path}.part"
         try:
-            with open(rp_path, 'rb') as f:
-                header = f.read(16)
-                if header != RPModelHandler.HEADER:
+            with open(rp_path, 'rb') as fin:
+                header = fin.read(len(RPModelHandler.HEADER))
+                hash_factory = RPModelHandler.HASHES.get(header)
+                if hash_factory is None:
                     logger.error("无效的模型文件头")
                     return False
 
-                md5 = f.read(16)
-                encrypted_data = f.read()
+                hasher = hash_factory()
+                expected = fin.read(hasher.digest_size)
 
-            model_data = bytes([b ^ RPModelHandler.KEY for b in encrypted_data])
+                # 解密到临时文件，校验通过后再替换目标文件
+                with open(part_path, 'wb') as fout:
+                    RPModelHandler._xor_stream(fin, fout, hasher, hash_output=True)
 
-            if hashlib.md5(model_data).digest() != md5:
+            # 校验完整性
+            if hasher.digest() != expected:
                 logger.error("模型文件校验失败")
+                os.remove(part_path)
                 return False
 
-            with open(pt_path, 'wb') as f:
-                f.write(model_data)
+            os.replace(part_path, pt_path)
 
             logger.info(f"模型解密成功: {rp_path} -> {pt_path}")
             return True
 
         except Exception as e:
             logger.error(f"模型解密失败: {e}")
+            if os.path.exists(part_path):
+                os.remove(part_path)
             return False
 
 
 class CameraThread(threading.Thread):
     """摄像头线程，使用队列安全传递帧"""
 
-    def __init__(self, camera_index, width, height):
+    # 预分配帧缓冲区数量：采集中1个 + 队列中1个 + 消费者持有1个
+    BUFFER_COUNT = 3
+
+    def __init__(self, camera_index, width, height, notify_fn=None):
         super().__init__(daemon=True)
         self.camera_index = camera_index
         self.width = width
         self.height = height
+        self.notify_fn = notify_fn  # 发布新帧后调用，通知界面线程取帧
         self.running = True
-        self.frame_queue = Queue(maxsize=1)
+        self.frame_queue = Queue(maxsize=1)  # 传递缓冲区索引
         self.camera = None
 
+        # 帧缓冲池，采集时直接读入预分配数组，避免每帧分配与复制
+        self._buffers = None
+        self._buffer_lock = threading.Lock()
+        self._queued_idx = None  # 队列中的缓冲区索引
+        self._held_idx = None  # 消费者持有的缓冲区索引
+
+        # 预览尺寸 (宽, 高)，设置后在采集线程中为每帧同步生成缩略图，与帧缓冲一一对应
+        self.preview_size = None
+        self._previews = [None] * self.BUFFER_COUNT
+
     def run(self):
         """线程主函数"""
         try:
@@ -203,35 +297,93 @@ class CameraThread(threading.Thread):
                 logger.error(f"无法打开摄像头 {self.camera_index}")
                 return
 
+            # 先设置MJPEG格式再设分辨率（DSHOW下顺序相反会被忽略），避免USB带宽限制帧率
+            self.camera.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
             self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
             self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
             self.camera.set(cv2.CAP_PROP_FPS, 30)
+            # 驱动只缓存1帧，预览与拍照使用的是最新画面（仅部分后端支持，如DSHOW）
+            buffer_ok = self.camera.set(cv2.CAP_PROP_BUFFERSIZE, 1)
 
-            logger.info(f"摄像头 {self.camera_index} 启动成功")
+            logger.info(f"摄像头 {self.camera_index} 启动成功 "
+                        f"(后端: {self.camera.getBackendName()}, 缓冲区设置{'生效' if buffer_ok else '不受支持'})")
 
             while self.running:
-                ret, frame = self.camera.read()
-                if ret:
-                    if self.frame_queue.full():
-                        try:
-                            self.frame_queue.get_nowait()
-                        except:
-                            pass
-                    self.frame_queue.put(frame.copy())
-
-                cv2.waitKey(1)
+                if self._buffers is None:
+                    # 首帧确定实际分辨率后再分配缓冲池
+                    ret, frame = self.camera.read()
+                    if ret:
+                        self._buffers = [frame] + [np.empty_like(frame) for _ in range(self.BUFFER_COUNT - 1)]
+                        self._publish(0)
+                else:
+                    idx = self._acquire_buffer()
+                    ret, frame = self.camera.read(self._buffers[idx])
+                    if ret:
+                        # 分辨率变化时OpenCV会返回新数组，替换对应缓冲区
+                        self._buffers[idx] = frame
+                        preview_size = self.preview_size
+                        if preview_size:
+                            # 缩小超过2倍时INTER_AREA质量更好
+                            self._previews[idx] = cv2.resize(frame, preview_size, dst=self._previews[idx],
+                                                             interpolation=cv2.INTER_AREA)
+                        self._publish(idx)
+
+                # read按摄像头帧率阻塞，无需waitKey；仅在读取失败时避免空转
+                if not ret:
+                    time.sleep(0.01)
+                elif self.notify_fn is not None:
+                    try:
+                        self.notify_fn()
+                    except Exception:
+                        # 窗口已销毁等情况下通知失败，直接退出
+                        break
 
         except Exception as e:
             logger.error(f"摄像头线程错误: {e}")
         finally:
             self.stop()
 
+    def _acquire_buffer(self):
+        """选取一个既不在队列中、也未被消费者持有的缓冲区"""
+        with self._buffer_lock:
+            for idx in range(self.BUFFER_COUNT):
+                if idx != self._queued_idx and idx != self._held_idx:
+                    return idx
+
+    def _publish(self, idx):
+        """发布新帧，队列中未被取走的旧帧直接丢弃"""
+        with self._buffer_lock:
+            try:
+                self.frame_queue.get_nowait()
+            except Empty:
+                pass
+            self.frame_queue.put_nowait(idx)
+            self._queued_idx = idx
+
     def get_frame(self):
-        """获取最新帧"""
-        try:
-            return self.frame_queue.get_nowait()
-        except:
-            return None
+        """获取最新帧
+
+        返回的数组在下一次取到新帧之前不会被采集线程覆盖，
+        需要跨帧保留时由调用方自行复制
+        """
+        with self._buffer_lock:
+            try:
+                idx = self.frame_queue.get_nowait()
+            except Empty:
+                return None
+            self._queued_idx = None
+            self._held_idx = idx
+            return self._buffers[idx]
+
+    def get_preview(self):
+        """获取与最近一次get_frame对应的预览缩略图，未设置预览尺寸时返回None"""
+        with self._buffer_lock:
+            if self._held_idx is None:
+                return None
+            preview = self._previews[self._held_idx]
+            if preview is None or preview.shape[1::-1] != self.preview_size:
+                return None
+            return preview
 
     def stop(self):
         """停止线程"""
@@ -299,6 +451,12 @@ class DraggablePreview:
         )
         self.canvas.pack(fill="both", expand=True, padx=0, pady=0)
 
+        # 常驻的预览图像与画布项，每帧只原地更新像素，避免反复创建位图
+        self.preview_size = (width, height - 30)
+        self._resized = np.empty((height - 30, width, 3), dtype=np.uint8)
+        self._tk_img = ImageTk.PhotoImage(Image.new("RGB", self.preview_size))
+        self._item_id = self.canvas.create_image(0, 0, image=self._tk_img, anchor="nw")
+
         # 绑定拖动事件
         title_frame.bind("<ButtonPress-1>", self.start_drag)
         title_frame.bind("<B1-Motion>", self.on_drag)
@@ -328,16 +486,13 @@ class DraggablePreview:
         """更新预览图像"""
         if frame is not None:
             try:
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                frame_resized = cv2.resize(frame_rgb, (self.width, self.height - 30))
+                # 摄像头按预览尺寸采集时无需再缩放
+                if frame.shape[1::-1] != self.preview_size:
+                    frame = cv2.resize(frame, self.preview_size, dst=self._resized)
 
-                from PIL import Image, ImageTk
-                pil_img = Image.fromarray(frame_resized)
-                preview_photo = ImageTk.PhotoImage(image=pil_img)
-
-                self.canvas.delete("all")
-                self.canvas.create_image(0, 0, image=preview_photo, anchor="nw")
-                self.canvas.photo = preview_photo
+                # 由Pillow在解包时完成BGR→RGB，省去单独的cvtColor
+                pil_img = Image.frombuffer("RGB", self.preview_size, frame, "raw", "BGR", 0, 1)
+                self._tk_img.paste(pil_img)
             except Exception as e:
                 logger.error(f"更新预览错误: {e}")
 
@@ -384,16 +539,41 @@ class PillTrainer(ctk.CTk):
         self.image_list = []
         self.current_image_idx = -1
         self.current_image_path = ""
+        self._label_path = None  # 当前图片对应的标注文件，切换图片时计算一次
         self.drawing = False
         self.start_x = 0
         self.start_y = 0
+        self._temp_rect = None  # 拖动中的临时框画布项
+
+        # 标注框直接绘制进图像，画布上只保留一个常驻图像项
+        self._canvas_base = None  # 当前图片的画布尺寸底图（只读，可能来自缓存）
+        self._canvas_buf = np.empty((CAMERA_HEIGHT, CAMERA_WIDTH, 3), dtype=np.uint8)
+        self._canvas_item = None
+
+        # 已缩放图片的LRU缓存，前后翻页时免去重复解码与缩放
+        self._img_cache = OrderedDict()  # (路径, 修改时间, 大小) -> 缩放后图像
+        self._img_cache_bytes = 0
+        self._img_cache_lock = threading.Lock()  # 预读线程与界面线程共用缓存
+        self._listed_files = []  # 文件列表框当前显示的文件名，用于增量刷新
+        self._file_index = {}  # 文件名 -> 列表框行号
+        self._listed_dir_key = None  # (目录, 修改时间)，目录未变化时跳过重新扫描
+
+        # 后台预读相邻图片，顺序翻页时解码已提前完成
+        self._io_pool = ThreadPoolExecutor(max_workers=2)
+        self._prefetch_futures = {}  # 路径 -> Future，仅在界面线程中访问
+        self._pending_image_path = None  # 最近一次请求加载的图片，解码完成时据此丢弃过期请求
+
+        # 训练线程及其停止标志，关闭窗口时通知训练循环尽快退出
+        self._train_thread = None
+        self._train_stop = threading.Event()
 
         # 模板管理
         self.current_template = "通用模板"
         self.custom_templates = self._load_custom_templates()
 
-        # 可用摄像头列表
-        self.available_cameras = self._detect_cameras()
+        # 可用摄像头列表，界面显示后在后台探测
+        self.available_cameras = []
+        self._cameras_detecting = True
 
         # 可拖动预览窗口
         self.preview_window = None
@@ -404,9 +584,15 @@ class PillTrainer(ctk.CTk):
         # 绑定键盘事件
         self._bind_keyboard_events()
 
+        # 预览由采集线程的新帧事件驱动，不再定时轮询
+        self.bind("<<NewFrame>>", self._update_preview)
+
         # 设置退出时清理
         self.protocol("WM_DELETE_WINDOW", self._on_closing)
 
+        # 摄像头探测较慢（DSHOW每个索引可达数秒），放到后台避免阻塞启动
+        threading.Thread(target=self._probe_cameras_bg, daemon=True).start()
+
     def _setup_ui(self):
         """设置UI界面"""
         # 创建分页面框架
@@ -423,6 +609,11 @@ class PillTrainer(ctk.CTk):
         self.notebook.add(self.settings_frame, text="训练设置")
         self._setup_settings_page()
 
+        # 首次进入训练设置页时才导入深度学习库检测GPU，只做标注时不承担导入开销
+        self._dl_probe_started = False
+        self._device_resolved = False  # GPU检测完成后设备选项才反映用户的真实选择
+        self.notebook.bind("<<NotebookTabChanged>>", self._on_tab_changed)
+
     def _setup_main_page(self):
         """设置主页面 - 优化布局"""
         # 使用网格布局
@@ -454,7 +645,7 @@ class PillTrainer(ctk.CTk):
 
         ctk.CTkLabel(cam_frame, text="摄像头：").pack(side="left", padx=(5, 2), pady=2)
 
-        cam_options = [f"摄像头 {i}" for i in self.available_cameras] if self.available_cameras else ["无可用摄像头"]
+        cam_options = ["正在检测..."]
         self.cam_combo = ctk.CTkComboBox(
             cam_frame,
             values=cam_options,
@@ -691,15 +882,18 @@ class PillTrainer(ctk.CTk):
 
         ctk.CTkLabel(device_frame, text="训练设备：").pack(side="left", padx=(10, 20), pady=10)
 
-        self.device_var = ctk.StringVar(value="GPU" if DL_AVAILABLE and torch and torch.cuda.is_available() else "CPU")
+        self.device_var = ctk.StringVar(value="CPU")
 
-        if DL_AVAILABLE and torch and torch.cuda.is_available():
-            ctk.CTkRadioButton(
-                device_frame,
-                text="GPU训练",
-                variable=self.device_var,
-                value="GPU"
-            ).pack(side="left", padx=20, pady=10)
+        # GPU是否可用需导入torch才能确定，检测完成前禁用
+        self.gpu_radio = ctk.CTkRadioButton(
+            device_frame,
+            text="GPU训练",
+            variable=self.device_var,
+            value="GPU",
+            state="disabled"
+        )
+        if DL_AVAILABLE:
+            self.gpu_radio.pack(side="left", padx=20, pady=10)
 
         ctk.CTkRadioButton(
             device_frame,
@@ -708,6 +902,25 @@ class PillTrainer(ctk.CTk):
             value="CPU"
         ).pack(side="left", padx=20, pady=10)
 
+        # 参数名 -> (控件, 类型)，按模板文件中的字段顺序，加载/保存模板与开始训练共用
+        self._param_widgets = {
+            "epochs": (self.epochs_entry, int),
+            "batch": (self.batch_entry, int),
+            "conf_thres": (self.conf_entry, float),
+            "iou_thres": (self.iou_entry, float),
+            "patience": (self.patience_entry, int),
+            "optimizer": (self.optimizer_combo, str),
+            "lr0": (self.lr0_entry, float),
+            "lrf": (self.lrf_entry, float),
+            "weight_decay": (self.weight_decay_entry, float),
+            "hsv_h": (self.hsv_h_entry, float),
+            "hsv_s": (self.hsv_s_entry, float),
+            "hsv_v": (self.hsv_v_entry, float),
+            "degrees": (self.degrees_entry, float),
+            "translate": (self.translate_entry, float),
+            "fliplr": (self.fliplr_entry, float),
+        }
+
         # 加载默认模板
         self._load_template("通用模板")
 
@@ -755,19 +968,40 @@ class PillTrainer(ctk.CTk):
             self.bind(key, lambda e, cmd=command: cmd())
 
     def _detect_cameras(self):
-        """检测可用摄像头"""
-        available = []
-        for i in range(5):
-            try:
-                cap = cv2.VideoCapture(i, cv2.CAP_DSHOW)
-                if cap.isOpened():
-                    ret, _ = cap.read()
-                    if ret:
-                        available.append(i)
-                    cap.release()
-            except:
-                continue
-        return available
+        """检测可用摄像头，各索引并行探测"""
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            results = list(pool.map(self._probe_camera, range(5)))
+        return [i for i, ok in enumerate(results) if ok]
+
+    @staticmethod
+    def _probe_camera(index):
+        """探测单个摄像头索引：能打开且能读到一帧才算可用（探测在后台进行，读帧不影响启动）"""
+        cap = None
+        try:
+            cap = cv2.VideoCapture(index, cv2.CAP_DSHOW)
+            return cap.isOpened() and cap.read()[0]
+        except:
+            return False
+        finally:
+            if cap is not None:
+                cap.release()
+
+    def _probe_cameras_bg(self):
+        """后台探测摄像头，完成后交给界面线程更新列表"""
+        cameras = self._detect_cameras()
+        try:
+            self.after(0, self._apply_camera_list, cameras)
+        except RuntimeError:
+            pass  # 探测完成前窗口已关闭
+
+    def _apply_camera_list(self, cameras):
+        """用探测结果更新摄像头下拉框"""
+        self._cameras_detecting = False
+        self.available_cameras = cameras
+        cam_options = [f"摄像头 {i}" for i in cameras] if cameras else ["无可用摄像头"]
+        self.cam_combo.configure(values=cam_options)
+        self.cam_combo.set(cam_options[0])
+        logger.info(f"检测到摄像头: {cameras}")
 
     def _toggle_camera(self):
         """打开/关闭摄像头"""
@@ -787,6 +1021,9 @@ class PillTrainer(ctk.CTk):
             logger.info("摄像头已关闭")
         else:
             # 打开摄像头
+            if self._cameras_detecting:
+                messagebox.showinfo("提示", "正在检测摄像头，请稍候")
+                return
             if not self.available_cameras:
                 messagebox.showerror("错误", "未检测到可用摄像头！")
                 return
@@ -796,7 +1033,7 @@ class PillTrainer(ctk.CTk):
             except:
                 cam_idx = 0
 
-            self.camera_thread = CameraThread(cam_idx, PREVIEW_WIDTH, PREVIEW_HEIGHT)
+            self.camera_thread = CameraThread(cam_idx, PREVIEW_WIDTH, PREVIEW_HEIGHT, self._notify_new_frame)
             self.camera_thread.start()
 
             self.cam_btn.configure(text="关闭摄像头")
@@ -807,11 +1044,10 @@ class PillTrainer(ctk.CTk):
             if not self.preview_window:
                 self.preview_window = DraggablePreview(self, PREVIEW_WIDTH, PREVIEW_HEIGHT + 30)
                 self.preview_window.show()
+            # 缩略图由采集线程生成，界面线程只负责贴图
+            self.camera_thread.preview_size = self.preview_window.preview_size
 
             self.status_label.configure(text="摄像头已打开")
-
-            # 启动预览更新
-            self.after(100, self._update_preview)
             logger.info(f"摄像头 {cam_idx} 已打开")
 
     def _toggle_preview_window(self):
@@ -824,24 +1060,25 @@ class PillTrainer(ctk.CTk):
                 self.preview_window.hide()
                 self.preview_toggle_btn.configure(text="📷 显示预览")
 
-    def _update_preview(self):
-        """更新摄像头预览"""
+    def _notify_new_frame(self):
+        """采集线程回调：向界面线程投递新帧事件"""
+        self.event_generate("<<NewFrame>>", when="tail")
+
+    def _update_preview(self, event=None):
+        """更新摄像头预览（由采集线程的<<NewFrame>>事件驱动）"""
         if self.camera_thread and self.camera_thread.is_alive():
             frame = self.camera_thread.get_frame()
             if frame is not None:
+                # 保存当前帧用于拍照（缓冲区在取到下一帧前一直由本线程持有，无需复制）
+                self.current_frame = frame
                 try:
                     # 更新预览窗口
                     if self.preview_window:
-                        self.preview_window.update_preview(frame)
-
-                    # 保存当前帧用于拍照
-                    self.current_frame = frame.copy()
+                        preview = self.camera_thread.get_preview()
+                        self.preview_window.update_preview(preview if preview is not None else frame)
                 except Exception as e:
                     logger.error(f"预览更新错误: {e}")
 
-            # 继续更新
-            self.after(50, self._update_preview)
-
     def _capture_photo(self):
         """拍照保存"""
         if not self.dataset_dir:
@@ -860,7 +1097,11 @@ class PillTrainer(ctk.CTk):
             img_name = f"pill_{timestamp}.jpg"
             img_path = img_dir / img_name
 
-            cv2.imwrite(str(img_path), self.current_frame)
+            # imencode+tofile支持Windows下的中文路径，且编码失败时能报错（imwrite只返回False）
+            ok, buf = cv2.imencode(".jpg", self.current_frame, [cv2.IMWRITE_JPEG_QUALITY, CAPTURE_JPEG_QUALITY])
+            if not ok:
+                raise ValueError("图片编码失败")
+            buf.tofile(str(img_path))
 
             self._refresh_file_list()
 
@@ -900,7 +1141,7 @@ class PillTrainer(ctk.CTk):
 
         try:
             img_dir = Path(self.dataset_dir) / "images" / "train"
-            self.image_list = sorted(glob.glob(str(img_dir / "*.jpg")) + glob.glob(str(img_dir / "*.png")))
+            self.image_list = _list_images(img_dir)
 
             if not self.image_list:
                 messagebox.showinfo("提示", "未找到图片，请先拍照或导入图片！")
@@ -918,48 +1159,109 @@ class PillTrainer(ctk.CTk):
             messagebox.showerror("错误", f"加载图片失败: {e}")
 
     def _load_image_by_idx(self, idx):
-        """加载指定索引的图片"""
+        """加载指定索引的图片：解码在后台线程完成，界面线程只负责显示"""
         if 0 <= idx < len(self.image_list):
-            try:
-                self.annotations.clear()
-                self.canvas.delete("all")
+            path = self.image_list[idx]
+            self._pending_image_path = path
 
-                self.current_image_path = self.image_list[idx]
+            # 该图片正在预读时直接等待其结果，避免重复解码
+            future = self._prefetch_futures.pop(path, None)
+            if future is None:
+                future = self._io_pool.submit(self._prefetch_image, path)
+            future.add_done_callback(lambda _: self._post_image_decoded(idx, path))
 
-                img = cv2.imread(self.current_image_path)
-                if img is None:
-                    raise ValueError(f"无法读取图片: {self.current_image_path}")
+    def _post_image_decoded(self, idx, path):
+        """解码线程回调：交给界面线程显示"""
+        try:
+            self.after(0, self._show_image, idx, path)
+        except RuntimeError:
+            pass  # 解码完成前窗口已关闭
 
-                img_resized = cv2.resize(img, (CAMERA_WIDTH, CAMERA_HEIGHT))
-                self._update_main_canvas(img_resized)
+    def _show_image(self, idx, path):
+        """显示已解码的图片及其标注，快速翻页时跳过已过期的请求"""
+        if path != self._pending_image_path:
+            return
 
-                self._load_annotations(img.shape[:2])
+        try:
+            self.annotations.clear()
 
-                self.current_image_idx = idx
+            self.current_image_path = path
+            self._label_path = Path(self.dataset_dir, "labels", "train", Path(path).stem + ".txt")
 
-                info_text = f"标注: {len(self.annotations)} 个框 | {idx + 1}/{len(self.image_list)}: {Path(self.current_image_path).name}"
-                self.image_info_label.configure(text=info_text)
-                self.status_label.configure(text=f"当前标注: {len(self.annotations)} 个框")
+            # 通常命中缓存；后台解码失败时在此重新读取并报错
+            img_resized = self._read_display_image(path)
+            self._load_annotations()
+            self._update_main_canvas(img_resized)
 
-                self._select_file_in_list(self.current_image_path)
+            self.current_image_idx = idx
+            self._prefetch_neighbors(idx)
 
-                logger.info(f"已加载图片: {self.current_image_path}")
+            info_text = f"标注: {len(self.annotations)} 个框 | {idx + 1}/{len(self.image_list)}: {Path(self.current_image_path).name}"
+            self.image_info_label.configure(text=info_text)
+            self.status_label.configure(text=f"当前标注: {len(self.annotations)} 个框")
 
-            except Exception as e:
-                logger.error(f"加载图片失败: {e}")
-                messagebox.showerror("错误", f"加载图片失败: {e}")
+            self._select_file_in_list(self.current_image_path)
 
-    def _update_main_canvas(self, img):
-        """更新主画布显示"""
+            logger.info(f"已加载图片: {self.current_image_path}")
+
+        except Exception as e:
+            logger.error(f"加载图片失败: {e}")
+            messagebox.showerror("错误", f"加载图片失败: {e}")
+
+    def _read_display_image(self, path):
+        """读取并缩放到画布尺寸，结果按文件修改时间缓存
+
+        可在预读线程中调用，解码在锁外进行
+        """
+        st = os.stat(path)
+        key = (path, st.st_mtime_ns, st.st_size)
+        with self._img_cache_lock:
+            cached = self._img_cache.get(key)
+            if cached is not None:
+                self._img_cache.move_to_end(key)
+                return cached
+
+        # fromfile+imdecode与imread开销相同，且支持Windows下的中文路径
+        img = cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            raise ValueError(f"无法读取图片: {path}")
+
+        img_resized = cv2.resize(img, (CAMERA_WIDTH, CAMERA_HEIGHT))
+        with self._img_cache_lock:
+            old = self._img_cache.pop(key, None)
+            if old is not None:
+                self._img_cache_bytes -= old.nbytes
+            self._img_cache[key] = img_resized
+            self._img_cache_bytes += img_resized.nbytes
+            while self._img_cache_bytes > IMAGE_CACHE_BYTES and len(self._img_cache) > 1:
+                _, old = self._img_cache.popitem(last=False)
+                self._img_cache_bytes -= old.nbytes
+        return img_resized
+
+    def _prefetch_neighbors(self, idx):
+        """后台预读前后相邻的图片到缓存"""
+        self._prefetch_futures = {p: f for p, f in self._prefetch_futures.items() if not f.done()}
+        for i in (idx + 1, idx - 1):
+            if 0 <= i < len(self.image_list):
+                path = self.image_list[i]
+                if path not in self._prefetch_futures:
+                    self._prefetch_futures[path] = self._io_pool.submit(self._prefetch_image, path)
+
+    def _prefetch_image(self, path):
+        """预读单张图片，失败时仅记录日志，正式加载时再报错"""
         try:
-            img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+            self._read_display_image(path)
+        except Exception as e:
+            logger.debug(f"预读图片失败: {path}: {e}")
 
-            from PIL import Image, ImageTk
-            pil_img = Image.fromarray(img_rgb)
-            self.photo = ImageTk.PhotoImage(image=pil_img)
+    def _update_main_canvas(self, img):
+        """更新主画布显示，img为画布尺寸的BGR图像"""
+        try:
+            self._canvas_base = img
 
-            self.canvas.delete("all")
-            self.canvas.create_image(0, 0, image=self.photo, anchor="nw")
+            if self._canvas_item is None:
+                self.photo = ImageTk.PhotoImage(Image.new("RGB", (CAMERA_WIDTH, CAMERA_HEIGHT)))
+                self._canvas_item = self.canvas.create_image(0, 0, image=self.photo, anchor="nw")
 
             self._draw_annotations()
 
@@ -967,59 +1269,49 @@ class PillTrainer(ctk.CTk):
             logger.error(f"更新画布失败: {e}")
 
     def _draw_annotations(self):
-        """绘制所有标注框"""
-        self.canvas.delete("anno_rect")
-        self.canvas.delete("anno_text")
+        """绘制所有标注框：在底图副本上绘制后整幅贴图，画布项数量不随框数增长"""
+        if self._canvas_base is None:
+            return
+
+        buf = self._canvas_buf
+        np.copyto(buf, self._canvas_base)
 
         for i, (x1, y1, x2, y2) in enumerate(self.annotations):
-            self.canvas.create_rectangle(
-                x1, y1, x2, y2,
-                outline="red",
-                width=2,
-                tags="anno_rect"
-            )
+            cv2.rectangle(buf, (x1, y1), (x2, y2), (0, 0, 255), 2)
+            cv2.putText(buf, str(i + 1), (x1 + 2, y1 + 20), cv2.FONT_HERSHEY_SIMPLEX,
+                        0.5, (255, 255, 255), 1, cv2.LINE_AA)
 
-            self.canvas.create_text(
-                x1 + 5, y1 + 15,
-                text=str(i + 1),
-                fill="white",
-                font=("Arial", 10, "bold"),  # 添加字体设置
-                tags="anno_text"
-            )
+        # 由Pillow在解包时完成BGR→RGB
+        self.photo.paste(Image.frombuffer("RGB", (CAMERA_WIDTH, CAMERA_HEIGHT), buf, "raw", "BGR", 0, 1))
 
-    def _load_annotations(self, img_shape):
+    def _load_annotations(self):
         """加载已有标注"""
         if not self.current_image_path:
             return
 
         try:
-            label_path = Path(self.dataset_dir) / "labels" / "train" / (Path(self.current_image_path).stem + ".txt")
+            label_path = self._label_path
 
-            if not label_path.exists():
+            if not label_path.exists() or label_path.stat().st_size == 0:
                 return
 
-            with open(label_path, 'r') as f:
-                lines = f.readlines()
-
-            img_h, img_w = img_shape[:2]
-
-            for line in lines:
-                parts = line.strip().split()
-                if len(parts) >= 5:
-                    try:
-                        cx = float(parts[1]) * CAMERA_WIDTH
-                        cy = float(parts[2]) * CAMERA_HEIGHT
-                        bw = float(parts[3]) * CAMERA_WIDTH
-                        bh = float(parts[4]) * CAMERA_HEIGHT
-
-                        x1 = int(cx - bw / 2)
-                        y1 = int(cy - bh / 2)
-                        x2 = int(cx + bw / 2)
-                        y2 = int(cy + bh / 2)
-
-                        self.annotations.append((x1, y1, x2, y2))
-                    except ValueError:
-                        continue
+            # 只含空白行的文件会触发"input contained no data"警告，视为无标注
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                try:
+                    # 一次解析全部标注行，只取中心点与宽高四列
+                    boxes = np.loadtxt(label_path, usecols=(1, 2, 3, 4), ndmin=2)
+                except ValueError:
+                    # 存在格式错误的行时容错解析，跳过无效行
+                    boxes = np.genfromtxt(label_path, usecols=(1, 2, 3, 4), ndmin=2, invalid_raise=False)
+                    boxes = boxes[~np.isnan(boxes).any(axis=1)] if boxes.size else boxes.reshape(0, 4)
+
+            # 归一化坐标 -> 画布像素坐标 (x1, y1, x2, y2)
+            scale = np.array([CAMERA_WIDTH, CAMERA_HEIGHT], dtype=np.float64)
+            centers = boxes[:, :2] * scale
+            half = boxes[:, 2:] * scale / 2
+            corners = np.hstack([centers - half, centers + half]).astype(int)
+            self.annotations.extend(map(tuple, corners.tolist()))
 
             logger.info(f"已加载 {len(self.annotations)} 个标注框")
 
@@ -1037,31 +1329,34 @@ class PillTrainer(ctk.CTk):
     def _on_canvas_drag(self, event):
         """画布拖动事件"""
         if self.drawing:
-            self.canvas.delete("temp_rect")
-            self.canvas.create_rectangle(
-                self.start_x, self.start_y,
-                event.x, event.y,
-                outline="yellow",
-                width=2,
-                tags="temp_rect"
-            )
+            # 复用同一个临时框，只更新坐标
+            if self._temp_rect is None:
+                self._temp_rect = self.canvas.create_rectangle(
+                    self.start_x, self.start_y,
+                    event.x, event.y,
+                    outline="yellow",
+                    width=2,
+                    tags="temp_rect"
+                )
+            else:
+                self.canvas.coords(self._temp_rect, self.start_x, self.start_y, event.x, event.y)
 
     def _on_canvas_release(self, event):
         """画布释放事件"""
         if self.drawing:
             self.drawing = False
 
-            x1 = min(self.start_x, event.x)
-            y1 = min(self.start_y, event.y)
-            x2 = max(self.start_x, event.x)
-            y2 = max(self.start_y, event.y)
+            x1, x2 = (self.start_x, event.x) if event.x >= self.start_x else (event.x, self.start_x)
+            y1, y2 = (self.start_y, event.y) if event.y >= self.start_y else (event.y, self.start_y)
 
-            if abs(x2 - x1) > MIN_BOX_SIZE and abs(y2 - y1) > MIN_BOX_SIZE:
+            # 端点已排序，宽高必为非负，无需再取绝对值
+            if x2 - x1 > MIN_BOX_SIZE and y2 - y1 > MIN_BOX_SIZE:
                 self.annotations.append((x1, y1, x2, y2))
                 self._draw_annotations()
                 self.status_label.configure(text=f"当前标注: {len(self.annotations)} 个框")
 
             self.canvas.delete("temp_rect")
+            self._temp_rect = None
 
     def _save_annotations(self):
         """保存标注"""
@@ -1074,30 +1369,21 @@ class PillTrainer(ctk.CTk):
                 return
 
         try:
-            label_dir = Path(self.dataset_dir) / "labels" / "train"
-            label_dir.mkdir(parents=True, exist_ok=True)
-
-            label_path = label_dir / (Path(self.current_image_path).stem + ".txt")
-
-            img = cv2.imread(self.current_image_path)
-            if img is None:
-                raise ValueError("无法读取原始图片")
+            label_path = self._label_path
 
-            img_h, img_w = img.shape[:2]
+            # 画布坐标 -> YOLO归一化坐标，与原图尺寸无关
+            boxes = np.asarray(self.annotations, dtype=np.float64).reshape(-1, 4)
+            scale = np.array([CAMERA_WIDTH, CAMERA_HEIGHT], dtype=np.float64)
+            centers = (boxes[:, :2] + boxes[:, 2:]) / 2 / scale
+            sizes = (boxes[:, 2:] - boxes[:, :2]) / scale
 
-            with open(label_path, 'w') as f:
-                for x1, y1, x2, y2 in self.annotations:
-                    cx = (x1 + x2) / 2 / CAMERA_WIDTH * img_w
-                    cy = (y1 + y2) / 2 / CAMERA_HEIGHT * img_h
-                    bw = (x2 - x1) / CAMERA_WIDTH * img_w
-                    bh = (y2 - y1) / CAMERA_HEIGHT * img_h
-
-                    cx /= img_w
-                    cy /= img_h
-                    bw /= img_w
-                    bh /= img_h
-
-                    f.write(f"0 {cx:.6f} {cy:.6f} {bw:.6f} {bh:.6f}\n")
+            rows = np.hstack([centers, sizes])
+            try:
+                np.savetxt(label_path, rows, fmt="0 %.6f %.6f %.6f %.6f")
+            except FileNotFoundError:
+                # 标注目录在选择数据集时已创建，仅在被外部删除后才需要重建
+                label_path.parent.mkdir(parents=True, exist_ok=True)
+                np.savetxt(label_path, rows, fmt="0 %.6f %.6f %.6f %.6f")
 
             self.status_label.configure(text=f"标注已保存: {label_path.name}")
             messagebox.showinfo("成功", f"标注已保存！共 {len(self.annotations)} 个框")
@@ -1128,13 +1414,33 @@ class PillTrainer(ctk.CTk):
             return
 
         try:
-            self.file_listbox.delete(0, "end")
             img_dir = Path(self.dataset_dir) / "images" / "train"
 
-            img_files = sorted(glob.glob(str(img_dir / "*.jpg")) + glob.glob(str(img_dir / "*.png")))
+            # 增删文件会更新目录修改时间，未变化时列表无需重新扫描
+            try:
+                dir_key = (str(img_dir), os.stat(img_dir).st_mtime_ns)
+            except FileNotFoundError:
+                dir_key = None
+            if dir_key is not None and dir_key == self._listed_dir_key:
+                self.status_label.configure(text=f"文件列表已刷新 ({len(self._listed_files)} 个文件)")
+                return
+
+            img_files = _list_images(img_dir)
+            names = [os.path.basename(img_path) for img_path in img_files]
+            self._listed_dir_key = dir_key
 
-            for img_path in img_files:
-                self.file_listbox.insert("end", Path(img_path).name)
+            # 只对差异部分增删，倒序应用以保持前面的索引不变
+            if names != self._listed_files:
+                matcher = difflib.SequenceMatcher(None, self._listed_files, names, autojunk=False)
+                for tag, i1, i2, j1, j2 in reversed(matcher.get_opcodes()):
+                    if tag == "equal":
+                        continue
+                    if i2 > i1:
+                        self.file_listbox.delete(i1, i2 - 1)
+                    if j2 > j1:
+                        self.file_listbox.insert(i1, *names[j1:j2])
+                self._listed_files = names
+                self._file_index = {name: i for i, name in enumerate(names)}
 
             self.status_label.configure(text=f"文件列表已刷新 ({len(img_files)} 个文件)")
 
@@ -1144,12 +1450,12 @@ class PillTrainer(ctk.CTk):
     def _select_file_in_list(self, file_path):
         """在文件列表中选中指定文件"""
         filename = Path(file_path).name
-        for i in range(self.file_listbox.size()):
-            if self.file_listbox.get(i) == filename:
-                self.file_listbox.selection_clear(0, "end")
-                self.file_listbox.selection_set(i)
-                self.file_listbox.see(i)
-                break
+        i = self._file_index.get(filename)
+        if i is None:
+            return
+        self.file_listbox.selection_clear(0, "end")
+        self.file_listbox.selection_set(i)
+        self.file_listbox.see(i)
 
     def _on_file_select(self, event):
         """文件列表选择事件"""
@@ -1229,30 +1535,19 @@ class PillTrainer(ctk.CTk):
             return
 
         # 填充参数到界面
-        param_mapping = [
-            (self.epochs_entry, "epochs"),
-            (self.batch_entry, "batch"),
-            (self.conf_entry, "conf_thres"),
-            (self.iou_entry, "iou_thres"),
-            (self.patience_entry, "patience"),
-            (self.lr0_entry, "lr0"),
-            (self.lrf_entry, "lrf"),
-            (self.weight_decay_entry, "weight_decay"),
-            (self.hsv_h_entry, "hsv_h"),
-            (self.hsv_s_entry, "hsv_s"),
-            (self.hsv_v_entry, "hsv_v"),
-            (self.degrees_entry, "degrees"),
-            (self.translate_entry, "translate"),
-            (self.fliplr_entry, "fliplr"),
-        ]
-
-        for entry, key in param_mapping:
-            entry.delete(0, "end")
-            entry.insert(0, str(template_data[key]))
+        for key, (widget, _) in self._param_widgets.items():
+            if widget is self.optimizer_combo:
+                widget.set(template_data[key])
+            else:
+                widget.delete(0, "end")
+                widget.insert(0, str(template_data[key]))
 
-        self.optimizer_combo.set(template_data["optimizer"])
         self.current_template = template_name
 
+    def _read_params(self):
+        """读取界面上的训练参数，格式错误时抛出ValueError"""
+        return {key: cast(widget.get()) for key, (widget, cast) in self._param_widgets.items()}
+
     def _on_template_change(self, template_name):
         """模板切换事件"""
         self._load_template(template_name)
@@ -1268,23 +1563,7 @@ class PillTrainer(ctk.CTk):
                 return
 
         try:
-            template_data = {
-                "epochs": int(self.epochs_entry.get()),
-                "batch": int(self.batch_entry.get()),
-                "conf_thres": float(self.conf_entry.get()),
-                "iou_thres": float(self.iou_entry.get()),
-                "patience": int(self.patience_entry.get()),
-                "optimizer": self.optimizer_combo.get(),
-                "lr0": float(self.lr0_entry.get()),
-                "lrf": float(self.lrf_entry.get()),
-                "weight_decay": float(self.weight_decay_entry.get()),
-                "hsv_h": float(self.hsv_h_entry.get()),
-                "hsv_s": float(self.hsv_s_entry.get()),
-                "hsv_v": float(self.hsv_v_entry.get()),
-                "degrees": float(self.degrees_entry.get()),
-                "translate": float(self.translate_entry.get()),
-                "fliplr": float(self.fliplr_entry.get()),
-            }
+            template_data = self._read_params()
         except ValueError as e:
             messagebox.showerror("错误", f"参数格式错误：{e}")
             return
@@ -1336,6 +1615,38 @@ class PillTrainer(ctk.CTk):
             logger.error(f"删除模板失败: {e}")
             messagebox.showerror("错误", f"删除模板失败: {e}")
 
+    def _on_tab_changed(self, event):
+        """切换到训练设置页时在后台检测GPU（只执行一次）"""
+        if self._dl_probe_started or not DL_AVAILABLE:
+            return
+        if self.notebook.select() == str(self.settings_frame):
+            self._dl_probe_started = True
+            threading.Thread(target=self._probe_dl_bg, daemon=True).start()
+
+    def _probe_dl_bg(self):
+        """后台导入深度学习库并检测GPU，完成后交给界面线程更新设备选项"""
+        try:
+            cuda_ok = _import_dl()
+        except Exception as e:
+            logger.error(f"加载深度学习库失败: {e}")
+            cuda_ok = False
+
+        try:
+            self.after(0, self._apply_device_options, cuda_ok)
+        except RuntimeError:
+            pass  # 检测完成前窗口已关闭
+
+    def _apply_device_options(self, cuda_ok):
+        """根据GPU检测结果更新训练设备选项，有GPU时默认选中"""
+        if self._device_resolved:
+            return
+        self._device_resolved = True
+        if cuda_ok:
+            self.gpu_radio.configure(state="normal")
+            self.device_var.set("GPU")
+        else:
+            self.gpu_radio.pack_forget()
+
     def _start_training(self):
         """开始训练"""
         if not DL_AVAILABLE:
@@ -1347,29 +1658,14 @@ class PillTrainer(ctk.CTk):
             return
 
         img_dir = Path(self.dataset_dir) / "images" / "train"
-        if not list(img_dir.glob("*.jpg")) and not list(img_dir.glob("*.png")):
+        if not _has_images(img_dir):
             messagebox.showwarning("警告", "无训练数据，请先标注图片！")
             return
 
         try:
-            params = {
-                "epochs": int(self.epochs_entry.get()),
-                "batch": int(self.batch_entry.get()),
-                "conf_thres": float(self.conf_entry.get()),
-                "iou_thres": float(self.iou_entry.get()),
-                "patience": int(self.patience_entry.get()),
-                "optimizer": self.optimizer_combo.get(),
-                "lr0": float(self.lr0_entry.get()),
-                "lrf": float(self.lrf_entry.get()),
-                "weight_decay": float(self.weight_decay_entry.get()),
-                "hsv_h": float(self.hsv_h_entry.get()),
-                "hsv_s": float(self.hsv_s_entry.get()),
-                "hsv_v": float(self.hsv_v_entry.get()),
-                "degrees": float(self.degrees_entry.get()),
-                "translate": float(self.translate_entry.get()),
-                "fliplr": float(self.fliplr_entry.get()),
-                "device": self.device_var.get(),
-            }
+            params = self._read_params()
+            # 尚未检测GPU时交给训练线程决定：有GPU即用GPU，与检测后的默认选项一致
+            params["device"] = self.device_var.get() if self._device_resolved else None
         except ValueError as e:
             messagebox.showerror("错误", f"参数格式错误：{e}")
             return
@@ -1392,7 +1688,13 @@ names: ['pill']
 
         def train_thread():
             try:
-                if params["device"] == "GPU" and torch.cuda.is_available():
+                self.status_label.configure(text="加载深度学习库...")
+                cuda_ok = _import_dl()
+                if params["device"] is None:
+                    params["device"] = "GPU" if cuda_ok else "CPU"
+                    self._dl_probe_started = True
+                    self.after(0, self._apply_device_options, cuda_ok)
+                if params["device"] == "GPU" and cuda_ok:
                     device = 0
                     device_name = torch.cuda.get_device_name(0)
                     self.status_label.configure(text=f"使用GPU训练: {device_name}")
@@ -1404,6 +1706,9 @@ names: ['pill']
 
                 self.status_label.configure(text="加载模型中...")
                 model = YOLO('yolov8n.pt')
+                # 每个批次后检查停止标志，关闭窗口时不必等到整轮训练结束
+                model.add_callback("on_train_batch_end", self._check_train_stop)
+                model.add_callback("on_train_epoch_end", self._check_train_stop)
 
                 self.status_label.configure(text="训练中...")
                 logger.info("开始训练...")
@@ -1437,27 +1742,59 @@ names: ['pill']
                     verbose=False,
                 )
 
+                if self._train_stop.is_set():
+                    logger.info("训练已中止")
+                    return
+
                 best_model_path = Path(self.dataset_dir) / "pill_train" / "weights" / "best.pt"
+
+                # GPU训练且导出依赖齐全时可额外导出FP16 TensorRT引擎：体积减半，推理更快（仅限有CUDA的检测端）
+                # 导出需占用GPU数分钟，由用户决定
+                engine_path = None
+                if device == 0 and TRT_EXPORT_AVAILABLE and messagebox.askyesno(
+                        "导出引擎", "是否额外导出TensorRT FP16引擎？\n导出需要数分钟，供有NVIDIA显卡的检测端使用。"):
+                    try:
+                        self.status_label.configure(text="导出TensorRT引擎中...")
+                        engine_path = Path(YOLO(str(best_model_path)).export(
+                            format="engine", half=True, imgsz=640, device=device))
+                        logger.info(f"TensorRT引擎已导出: {engine_path}")
+                    except Exception as e:
+                        logger.error(f"导出TensorRT引擎失败: {e}")
+
                 self.status_label.configure(text="训练完成！")
 
                 if messagebox.askyesno("训练完成", f"训练完成！\n模型已保存至:\n{best_model_path}\n\n是否加密模型？"):
                     rp_path = best_model_path.with_suffix('.rp')
                     if RPModelHandler.encrypt_model(str(best_model_path), str(rp_path)):
-                        messagebox.showinfo("成功", f"模型已加密保存为:\n{rp_path}")
+                        saved = [str(rp_path)]
+                        # .pt 版本始终保留，供无CUDA的机器使用
+                        if engine_path and engine_path.exists():
+                            trt_rp_path = best_model_path.with_name("best_trt.rp")
+                            if RPModelHandler.encrypt_model(str(engine_path), str(trt_rp_path)):
+                                saved.append(f"{trt_rp_path}（TensorRT FP16，需NVIDIA显卡）")
+                        messagebox.showinfo("成功", "模型已加密保存为:\n" + "\n".join(saved))
 
                 logger.info(f"训练完成，模型保存在: {best_model_path}")
 
             except Exception as e:
                 error_msg = str(e)
                 logger.error(f"训练失败: {error_msg}")
+                if self._train_stop.is_set():
+                    return  # 窗口正在关闭，不再弹窗
                 self.status_label.configure(text=f"训练失败: {error_msg}")
                 self.after(0, lambda: messagebox.showerror("错误", f"训练失败:\n{error_msg}"))
 
-        thread = threading.Thread(target=train_thread, daemon=True)
-        thread.start()
+        self._train_stop.clear()
+        self._train_thread = threading.Thread(target=train_thread, daemon=True)
+        self._train_thread.start()
 
         messagebox.showinfo("提示", "训练已开始，请查看状态栏进度...")
 
+    def _check_train_stop(self, trainer):
+        """训练回调：收到停止请求时让训练器在当前批次后退出"""
+        if self._train_stop.is_set():
+            trainer.stop = True
+
     def _split_train_val(self):
         """拆分训练集和验证集"""
         try:
@@ -1469,7 +1806,7 @@ names: ['pill']
             val_img_dir.mkdir(parents=True, exist_ok=True)
             val_label_dir.mkdir(parents=True, exist_ok=True)
 
-            img_files = sorted(glob.glob(str(img_dir / "*.jpg")) + glob.glob(str(img_dir / "*.png")))
+            img_files = _list_images(img_dir)
 
             if len(img_files) < 5:
                 logger.info("数据量不足，不拆分验证集")
@@ -1478,16 +1815,20 @@ names: ['pill']
             val_count = max(2, int(len(img_files) * VAL_SPLIT_RATIO))
             val_files = random.sample(img_files, val_count)
 
+            # 同一数据集目录内移动，os.replace只需一次rename系统调用
+            label_dir, val_img_dir, val_label_dir = str(label_dir), str(val_img_dir), str(val_label_dir)
+
             moved_count = 0
             for img_path in val_files:
                 try:
-                    dst_img = val_img_dir / Path(img_path).name
-                    shutil.move(img_path, dst_img)
+                    name = os.path.basename(img_path)
+                    os.replace(img_path, os.path.join(val_img_dir, name))
 
-                    label_path = label_dir / (Path(img_path).stem + ".txt")
-                    if label_path.exists():
-                        dst_label = val_label_dir / label_path.name
-                        shutil.move(label_path, dst_label)
+                    label_name = os.path.splitext(name)[0] + ".txt"
+                    try:
+                        os.replace(os.path.join(label_dir, label_name), os.path.join(val_label_dir, label_name))
+                    except FileNotFoundError:
+                        pass  # 未标注的图片没有标签文件
 
                     moved_count += 1
                 except Exception as e:
@@ -1507,6 +1848,28 @@ names: ['pill']
         if self.preview_window:
             self.preview_window.destroy()
 
+        self._io_pool.shutdown(wait=False)
+
+        # 通知训练线程退出；训练器还要完成收尾验证，先隐藏窗口，由事件循环轮询等待，
+        # 期间训练线程对界面的调用仍能得到处理
+        if self._train_thread and self._train_thread.is_alive():
+            self._train_stop.set()
+            self.withdraw()
+            self._close_deadline = time.monotonic() + TRAIN_STOP_TIMEOUT
+            self.after(TRAIN_STOP_POLL_MS, self._finish_closing)
+        else:
+            self._finish_closing()
+
+    def _finish_closing(self):
+        """训练线程退出后释放CUDA缓存并销毁窗口，超时则直接退出"""
+        if self._train_thread and self._train_thread.is_alive():
+            if time.monotonic() < self._close_deadline:
+                self.after(TRAIN_STOP_POLL_MS, self._finish_closing)
+                return
+            logger.warning("训练线程未能在限定时间内退出")
+        elif torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
         self.destroy()
         logger.info("应用程序已关闭")
 